@@ -6,6 +6,8 @@
 
 import copy
 import gyp.input
+import gyp.profiling
+import multiprocessing
 import optparse
 import os.path
 import re
@@ -20,6 +22,7 @@ debug = {}
 DEBUG_GENERAL = 'general'
 DEBUG_VARIABLES = 'variables'
 DEBUG_INCLUDES = 'includes'
+DEBUG_MEMORY = 'memory'
 
 
 def DebugOutput(mode, message):
@@ -108,7 +111,13 @@ def Load(build_files, format, default_variables={},
 
   # Process the input specific to this generator.
   result = gyp.input.Load(build_files, default_variables, includes[:],
-                          depth, generator_input_info, check, circular_check)
+                          depth, generator_input_info, check, circular_check,
+                          params.get('parallel_load', 0),
+                          params.get('load_cache_dir'),
+                          params.get('low_memory', False),
+                          params.get('command_cache_dir'),
+                          params.get('command_jobs', 0),
+                          params.get('pymod_jobs', 0))
   return [generator] + result
 
 def NameValueListToDict(name_value_list):
@@ -277,7 +286,8 @@ def main(args):
   parser.add_option('-d', '--debug', dest='debug', metavar='DEBUGMODE',
                     action='append', default=[], help='turn on a debugging '
                     'mode for debugging GYP.  Supported modes are "variables", '
-                    '"includes" and "general" or "all" for all of them.')
+                    '"includes", "memory" and "general" or "all" for all of '
+                    'them.')
   parser.add_option('-S', '--suffix', dest='suffix', default='',
                     help='suffix to add to generated files')
   parser.add_option('-G', dest='generator_flags', action='append', default=[],
@@ -305,6 +315,55 @@ def main(args):
   parser.add_option('--no-circular-check', dest='circular_check',
                     action='store_false', default=True, regenerate=False,
                     help="don't check for circular relationships between files")
+  parser.add_option('--parallel-load', dest='parallel_load',
+                    action='store_true', regenerate=False,
+                    help='load build files in a pool of worker processes')
+  parser.add_option('--parallel-load-jobs', dest='parallel_load_jobs',
+                    action='store', type='int', metavar='N', regenerate=False,
+                    help='number of worker processes for --parallel-load '
+                    '(implies --parallel-load, defaults to the number of '
+                    'CPUs)')
+  parser.add_option('--load-cache', dest='load_cache', action='store_true',
+                    help='reuse the results of loading build files that have '
+                    'not changed since the previous run')
+  parser.add_option('--load-cache-dir', dest='load_cache_dir', action='store',
+                    default=None, metavar='DIR', type='path',
+                    help='directory for --load-cache entries (implies '
+                    '--load-cache, defaults to gyp-load-cache in the output '
+                    'directory)')
+  parser.add_option('--command-cache', dest='command_cache',
+                    action='store_true',
+                    help='reuse the output of <!() commands from previous '
+                    'runs that ran them in the same directory with the same '
+                    'PATH, PYTHONPATH, GYP_* variables and variables the '
+                    'command names; <!nocache() commands are always run')
+  parser.add_option('--command-cache-dir', dest='command_cache_dir',
+                    action='store', default=None, metavar='DIR', type='path',
+                    help='directory for --command-cache entries (implies '
+                    '--command-cache, defaults to gyp-command-cache in the '
+                    'output directory)')
+  parser.add_option('--command-jobs', dest='command_jobs', action='store',
+                    type='int', metavar='N', regenerate=False,
+                    help='run the independent <!() commands of each build '
+                    'file N at a time before expanding it, which can change '
+                    'results if the commands depend on each other (by '
+                    'default commands run one at a time as they are '
+                    'expanded)')
+  parser.add_option('--pymod-jobs', dest='pymod_jobs', action='store',
+                    type='int', metavar='N', regenerate=False,
+                    help='run the <!pymod_do_main() calls of each build file '
+                    'in a pool of N worker processes, which keep the modules '
+                    'imported for the rest of the run')
+  parser.add_option('--low-memory', dest='low_memory', action='store_true',
+                    regenerate=False,
+                    help='free the contents of included files once all build '
+                    'files have been loaded; --debug memory reports the peak '
+                    'memory use of loading')
+  parser.add_option('--profile', dest='profile', action='store',
+                    metavar='PATH', regenerate=False,
+                    help='write the time and memory taken by each phase of '
+                    'the run, build file and target to PATH, as a Chrome '
+                    'trace that chrome://tracing can display')
 
   # We read a few things from ~/.gyp, so set up a var for that.
   home_vars = ['HOME']
@@ -452,6 +511,27 @@ def main(args):
       options.msvs_version
     generator_flags['msvs_version'] = options.msvs_version
 
+  parallel_load = 0
+  if options.parallel_load_jobs:
+    parallel_load = options.parallel_load_jobs
+  elif options.parallel_load:
+    parallel_load = multiprocessing.cpu_count()
+
+  load_cache_dir = options.load_cache_dir
+  if not load_cache_dir and options.load_cache:
+    load_cache_dir = os.path.join(options.generator_output or options.depth,
+                                  generator_flags.get('output_dir', 'out'),
+                                  'gyp-load-cache')
+
+  command_cache_dir = options.command_cache_dir
+  if not command_cache_dir and options.command_cache:
+    command_cache_dir = os.path.join(options.generator_output or options.depth,
+                                     generator_flags.get('output_dir', 'out'),
+                                     'gyp-command-cache')
+
+  if options.profile:
+    gyp.profiling.Start()
+
   # Generate all requested formats (use a set in case we got one format request
   # twice)
   for format in set(options.formats):
@@ -461,7 +541,13 @@ def main(args):
               'cwd': os.getcwd(),
               'build_files_arg': build_files_arg,
               'gyp_binary': sys.argv[0],
-              'home_dot_gyp': home_dot_gyp}
+              'home_dot_gyp': home_dot_gyp,
+              'parallel_load': parallel_load,
+              'load_cache_dir': load_cache_dir,
+              'command_cache_dir': command_cache_dir,
+              'command_jobs': options.command_jobs or 0,
+              'pymod_jobs': options.pymod_jobs or 0,
+              'low_memory': options.low_memory}
 
     # Start with the default variables from the command line.
     [generator, flat_list, targets, data] = Load(build_files, format,
@@ -477,7 +563,11 @@ def main(args):
     # that targets may be built.  Build systems that operate serially or that
     # need to have dependencies defined before dependents reference them should
     # generate targets in the order specified in flat_list.
-    generator.GenerateOutput(flat_list, targets, data, params)
+    with gyp.profiling.Span('generate', format=format):
+      generator.GenerateOutput(flat_list, targets, data, params)
+
+  if options.profile:
+    gyp.profiling.Stop(options.profile)
 
   # Done
   return 0
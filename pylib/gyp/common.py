@@ -6,6 +6,7 @@ from __future__ import with_statement
 
 import errno
 import filecmp
+import hashlib
 import os.path
 import re
 import tempfile
@@ -37,15 +38,44 @@ def ExceptionAppend(e, msg):
     e.args = (str(e.args[0]) + ' ' + msg,) + e.args[1:]
 
 
-def ParseQualifiedTarget(target):
-  # Splits a qualified target into a build file, target name and toolset.
+class TargetRef(object):
+  """The parts of a qualified target: its build_file, target name and
+  toolset, any of which but the target name may be None.
+
+  There is only one TargetRef for each qualified target string, see
+  GetTargetRef, so each string is split only once, and TargetRefs can be
+  compared and used as dict keys by identity.
+  """
+  __slots__ = ('qualified_target', 'build_file', 'target', 'toolset')
+
+  def __init__(self, qualified_target, build_file, target, toolset):
+    self.qualified_target = qualified_target
+    self.build_file = build_file
+    self.target = target
+    self.toolset = toolset
+
+  def __repr__(self):
+    return 'TargetRef(%r)' % self.qualified_target
+
+
+# Maps qualified target strings to their TargetRefs.
+_target_refs = {}
+
+
+def GetTargetRef(qualified_target):
+  # Returns the TargetRef for qualified_target, splitting it the first time.
+  try:
+    return _target_refs[qualified_target]
+  except KeyError:
+    pass
 
   # NOTE: rsplit is used to disambiguate the Windows drive letter separator.
-  target_split = target.rsplit(':', 1)
+  target_split = qualified_target.rsplit(':', 1)
   if len(target_split) == 2:
     [build_file, target] = target_split
   else:
     build_file = None
+    target = qualified_target
 
   target_split = target.rsplit('#', 1)
   if len(target_split) == 2:
@@ -53,7 +83,15 @@ def ParseQualifiedTarget(target):
   else:
     toolset = None
 
-  return [build_file, target, toolset]
+  target_ref = TargetRef(qualified_target, build_file, target, toolset)
+  _target_refs[qualified_target] = target_ref
+  return target_ref
+
+
+def ParseQualifiedTarget(target):
+  # Splits a qualified target into a build file, target name and toolset.
+  target_ref = GetTargetRef(target)
+  return [target_ref.build_file, target_ref.target, target_ref.toolset]
 
 
 def ResolveTarget(build_file, target, toolset):
@@ -92,16 +130,27 @@ def ResolveTarget(build_file, target, toolset):
 
 def BuildFile(fully_qualified_target):
   # Extracts the build file from the fully qualified target.
-  return ParseQualifiedTarget(fully_qualified_target)[0]
+  return GetTargetRef(fully_qualified_target).build_file
+
+
+# Maps (build_file, target, toolset) to the qualified target string, so that
+# equal qualified targets are the same string object.
+_qualified_targets = {}
 
 
 def QualifiedTarget(build_file, target, toolset):
   # "Qualified" means the file that a target was defined in and the target
   # name, separated by a colon, suffixed by a # and the toolset name:
   # /path/to/file.gyp:target_name#toolset
+  key = (build_file, target, toolset)
+  try:
+    return _qualified_targets[key]
+  except KeyError:
+    pass
   fully_qualified = build_file + ':' + target
   if toolset:
     fully_qualified = fully_qualified + '#' + toolset
+  _qualified_targets[key] = fully_qualified
   return fully_qualified
 
 
@@ -273,6 +322,72 @@ def AllTargets(target_list, target_dicts, build_file):
   return bftargets + deptargets
 
 
+def ComputeWaves(target_list, target_dicts):
+  """Splits target_list, which lists dependencies before their dependents,
+  into waves of targets that only depend on targets in earlier waves.  The
+  targets in each wave are in the order of target_list."""
+  wave_numbers = {}
+  waves = []
+  for qualified_target in target_list:
+    wave_number = 0
+    for dep in target_dicts[qualified_target].get('dependencies', []):
+      if dep in wave_numbers:
+        wave_number = max(wave_number, wave_numbers[dep] + 1)
+    wave_numbers[qualified_target] = wave_number
+    if wave_number == len(waves):
+      waves.append([])
+    waves[wave_number].append(qualified_target)
+  return waves
+
+
+# Maps the extensions of the sources that a jumbo target merges to the
+# extension of the unity file that includes them.
+JUMBO_EXTENSIONS = {
+  '.c': '.c',
+  '.cc': '.cc',
+  '.cpp': '.cc',
+  '.cxx': '.cc',
+  '.m': '.m',
+  '.mm': '.mm',
+}
+
+
+def JumboUnits(spec, sources, objc=False):
+  """Splits the sources of a target with 'jumbo' set into unity files.
+
+  Each language's sources are divided, in order, into 'jumbo_file_count'
+  (default 1) units of roughly equal size.  Returns a list of (extension,
+  sources) pairs, one for each unity file to include |sources| from, and the
+  list of sources that are still compiled on their own: those named in
+  'jumbo_excluded_files', those that aren't C or C++ (or Objective-C, if objc
+  is true), generated sources whose paths contain variables, and units that
+  would only hold a single source.
+  """
+  excluded = set(spec.get('jumbo_excluded_files', []))
+  file_count = int(spec.get('jumbo_file_count', 1))
+  languages = {}
+  rest = []
+  for source in sources:
+    extension = JUMBO_EXTENSIONS.get(os.path.splitext(source)[1])
+    if (extension is None or source in excluded or '$' in source or
+        (extension in ('.m', '.mm') and not objc)):
+      rest.append(source)
+    else:
+      languages.setdefault(extension, []).append(source)
+  units = []
+  for extension in sorted(languages):
+    language_sources = languages[extension]
+    count = min(file_count, len(language_sources))
+    for i in range(count):
+      unit = language_sources[i * len(language_sources) // count:
+                              (i + 1) * len(language_sources) // count]
+      if len(unit) > 1:
+        units.append((extension, unit))
+      else:
+        rest.extend(unit)
+  return units, rest
+
+
 def WriteOnDiff(filename):
   """Write to a file only if the new contents differ.
 
@@ -280,12 +395,14 @@ def WriteOnDiff(filename):
     filename: name of the file to potentially write to.
   Returns:
     A file like object which will write to temporary file and only overwrite
-    the target if it differs (on close).
+    the target if it differs (on close).  After close, its changed attribute
+    is true if the target was written.
   """
 
   class Writer:
     """Wrapper around file which only covers the target if it differs."""
     def __init__(self):
+      self.changed = False
       # Pick temporary file.
       tmp_fd, self.tmp_path = tempfile.mkstemp(
           suffix='.tmp',
@@ -338,6 +455,7 @@ def WriteOnDiff(filename):
             # is no way to make the switch atomic.
             os.remove(filename)
           os.rename(self.tmp_path, filename)
+          self.changed = True
       except Exception:
         # Don't leave turds behind.
         os.unlink(self.tmp_path)
@@ -346,6 +464,24 @@ def WriteOnDiff(filename):
   return Writer()
 
 
+@memoize
+def GypSourceDigest():
+  """Returns a digest of the sources of the gyp package, for caches whose
+  entries must not outlive the version of gyp that wrote them."""
+  digest = hashlib.sha1()
+  gyp_dir = os.path.dirname(os.path.abspath(__file__))
+  for root, dirs, files in os.walk(gyp_dir):
+    dirs.sort()
+    for name in sorted(files):
+      if name.endswith('.py'):
+        f = open(os.path.join(root, name), 'rb')
+        try:
+          digest.update(f.read())
+        finally:
+          f.close()
+  return digest.hexdigest()
+
+
 def GetFlavor(params):
   """Returns |params.flavor| if it's set, the system's default flavor else."""
   flavors = {
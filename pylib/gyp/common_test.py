@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Unit tests for the common.py file."""
+
+import gyp.common
+import unittest
+
+
+class TestQualifiedTargets(unittest.TestCase):
+
+  def test_ParseQualifiedTarget(self):
+    self.assertEqual(['a/b.gyp', 'c', 'host'],
+                     gyp.common.ParseQualifiedTarget('a/b.gyp:c#host'))
+    self.assertEqual(['c:/a/b.gyp', 'c', None],
+                     gyp.common.ParseQualifiedTarget('c:/a/b.gyp:c'))
+    self.assertEqual([None, 'c', 'target'],
+                     gyp.common.ParseQualifiedTarget('c#target'))
+    self.assertEqual([None, 'c', None], gyp.common.ParseQualifiedTarget('c'))
+    self.assertEqual('a/b.gyp', gyp.common.BuildFile('a/b.gyp:c#host'))
+
+  def test_GetTargetRef(self):
+    target_ref = gyp.common.GetTargetRef('a/b.gyp:c#host')
+    self.assertTrue(target_ref is gyp.common.GetTargetRef('a/b.gyp:c#host'))
+    self.assertEqual('a/b.gyp:c#host', target_ref.qualified_target)
+    self.assertEqual(('a/b.gyp', 'c', 'host'),
+                     (target_ref.build_file, target_ref.target,
+                      target_ref.toolset))
+
+  def test_QualifiedTarget(self):
+    qualified_target = gyp.common.QualifiedTarget('a/b.gyp', 'c', 'host')
+    self.assertEqual('a/b.gyp:c#host', qualified_target)
+    self.assertTrue(qualified_target is
+                    gyp.common.QualifiedTarget('a/b.gyp', 'c', 'host'))
+    self.assertEqual('a/b.gyp:c', gyp.common.QualifiedTarget('a/b.gyp', 'c',
+                                                             None))
+
+
+class TestComputeWaves(unittest.TestCase):
+
+  def test_Waves(self):
+    target_dicts = {
+      'a.gyp:lib#target': {},
+      'a.gyp:tool#target': {},
+      'a.gyp:gen#target': {'dependencies': ['a.gyp:tool#target']},
+      'a.gyp:exe#target': {
+        'dependencies': ['a.gyp:lib#target', 'a.gyp:gen#target'],
+      },
+    }
+    target_list = ['a.gyp:lib#target', 'a.gyp:tool#target',
+                   'a.gyp:gen#target', 'a.gyp:exe#target']
+    self.assertEqual([['a.gyp:lib#target', 'a.gyp:tool#target'],
+                      ['a.gyp:gen#target'],
+                      ['a.gyp:exe#target']],
+                     gyp.common.ComputeWaves(target_list, target_dicts))
+
+
+class TestJumboUnits(unittest.TestCase):
+
+  def test_Units(self):
+    spec = {'jumbo_file_count': 2, 'jumbo_excluded_files': ['d.cc']}
+    sources = ['a.cc', 'b.cpp', 'c.cc', 'd.cc', 'e.cc', 'f.c', 'g.c', 'h.h',
+               'x.S', '$!INTERMEDIATE_DIR/gen.cc', 'i.m', 'j.m']
+    units, rest = gyp.common.JumboUnits(spec, sources)
+    # The two C sources are split into units of one, which aren't merged.
+    self.assertEqual([('.cc', ['a.cc', 'b.cpp']), ('.cc', ['c.cc', 'e.cc'])],
+                     units)
+    self.assertEqual(['d.cc', 'h.h', 'x.S', '$!INTERMEDIATE_DIR/gen.cc',
+                      'i.m', 'j.m', 'f.c', 'g.c'], rest)
+
+  def test_ObjC(self):
+    units, rest = gyp.common.JumboUnits({}, ['a.m', 'b.m', 'c.mm'], objc=True)
+    self.assertEqual([('.m', ['a.m', 'b.m'])], units)
+    self.assertEqual(['c.mm'], rest)
+
+
+if __name__ == '__main__':
+  unittest.main()
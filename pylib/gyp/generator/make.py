@@ -23,10 +23,13 @@
 
 import gyp
 import gyp.common
+import gyp.incremental
 import gyp.system_test
 import gyp.xcode_emulation
+import multiprocessing
 import os
 import re
+import signal
 import sys
 
 generator_default_variables = {
@@ -749,6 +752,8 @@ $(obj).$(TOOLSET)/$(TARGET)/%%.o: $(obj)/%%%s FORCE_DO_CMD
     # Sources.
     all_sources = spec.get('sources', []) + extra_sources
     if all_sources:
+      if int(spec.get('jumbo', 0)):
+        all_sources = self.WriteJumboUnits(spec, all_sources, part_of_all)
       self.WriteSources(
           configs, deps, all_sources, extra_outputs,
           extra_link_deps, part_of_all,
@@ -1108,6 +1113,42 @@ $(obj).$(TOOLSET)/$(TARGET)/%%.o: $(obj)/%%%s FORCE_DO_CMD
     bundle_deps.append(out)
 
 
+  def WriteJumboUnits(self, spec, sources, part_of_all):
+    """Write Makefile code to generate the unity files that merge the sources
+    of a jumbo target, and return the sources to compile in place of
+    |sources|.
+
+    The unity files are written at build time, into the intermediate
+    directory of the configuration being built.  do_cmd rewrites them when
+    their list of sources changes.
+    """
+    units, rest = gyp.common.JumboUnits(spec, sources,
+                                        objc=self.flavor == 'mac')
+    if not units:
+      return sources
+    self.WriteLn('### Generated unity files for jumbo compilation.')
+    self.WriteLn('quiet_cmd_jumbo = JUMBO $@')
+    int_dir = generator_default_variables['INTERMEDIATE_DIR']
+    unit_sources = []
+    for i, (extension, unit) in enumerate(units):
+      unit_source = os.path.join(int_dir, 'jumbo_%d%s' % (i, extension))
+      includes = []
+      for source in unit:
+        assert ' ' not in source, (
+            "Spaces in jumbo source filenames not supported (%s)" % source)
+        if not os.path.isabs(source):
+          source = '$(abs_srcdir)/' + self.Absolutify(source)
+        includes.append(source)
+      # "#" starts a comment in the depfiles that do_cmd records commands in,
+      # so have printf produce it instead.
+      self.WriteLn("%s: cmd_jumbo = printf '\\043include \"%%s\"\\n' %s > $@"
+                   % (unit_source, ' '.join(includes)))
+      self.WriteDoCmd([unit_source], [], 'jumbo', part_of_all)
+      unit_sources.append(unit_source)
+    self.WriteLn()
+    return unit_sources + rest
+
+
   def WriteSources(self, configs, deps, sources,
                    extra_outputs, extra_link_deps,
                    part_of_all, precompiled_header):
@@ -1856,6 +1897,42 @@ $(obj).$(TOOLSET)/$(TARGET)/%%.o: $(obj)/%%%s FORCE_DO_CMD
     return '$(builddir)/' + self.alias
 
 
+def WriteMakefileTarget(dependency_outputs, dependency_link_deps, prefix,
+                        generator_flags, flavor, qualified_target, base_path,
+                        output_file, spec, configs, part_of_all):
+  """Writes the .mk file for qualified_target in a worker process.
+
+  dependency_outputs and dependency_link_deps hold the target_outputs and
+  target_link_deps entries of the target's dependencies, and prefix is the
+  srcdir_prefix of the parent process.  Returns the target's entries in
+  target_outputs and target_link_deps, and the number of outputs of the .mk
+  file.
+  """
+  global srcdir_prefix
+  srcdir_prefix = prefix
+  target_outputs.update(dependency_outputs)
+  target_link_deps.update(dependency_link_deps)
+  writer = MakefileWriter(generator_flags, flavor)
+  writer.Write(qualified_target, base_path, output_file, spec, configs,
+               part_of_all=part_of_all)
+  return (target_outputs[qualified_target],
+          target_link_deps.get(qualified_target),
+          writer.NumOutputs())
+
+
+def CallWriteMakefileTarget(args):
+  """Wrapper around WriteMakefileTarget for parallel generation.
+
+  This runs in a worker process.  Returns (result, None), or (None, exception)
+  if writing failed.
+  """
+  try:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    return (WriteMakefileTarget(*args), None)
+  except Exception, e:
+    return (None, e)
+
+
 def WriteAutoRegenerationRule(params, root_makefile, makefile_name,
                               build_files):
   """Write the target to regenerate the Makefile."""
@@ -2040,10 +2117,22 @@ def GenerateOutput(target_list, target_dicts, data, params):
     for target in gyp.common.AllTargets(target_list, target_dicts, build_file):
       needed_targets.add(target)
 
+  # With -G incremental, only the .mk files of targets whose inputs changed
+  # since the previous run are written.
+  manifest = None
+  if generator_flags.get('incremental'):
+    manifest = gyp.incremental.Manifest(
+        os.path.join(os.path.dirname(makefile_path), builddir_name,
+                     '.gyp-incremental'))
+
   num_outputs = 0
   build_files = set()
   include_list = set()
-  for qualified_target in target_list:
+
+  def PrepareTarget(qualified_target):
+    """Notes the build files and the .mk file of qualified_target, and returns
+    (base_path, output_file, spec, configs, part_of_all, digest) for writing
+    the .mk file."""
     build_file, target, toolset = gyp.common.ParseQualifiedTarget(
         qualified_target)
 
@@ -2078,10 +2167,17 @@ def GenerateOutput(target_list, target_dicts, data, params):
     if flavor == 'mac':
       gyp.xcode_emulation.MergeGlobalXcodeSettingsToSpec(data[build_file], spec)
 
-    writer = MakefileWriter(generator_flags, flavor)
-    writer.Write(qualified_target, base_path, output_file, spec, configs,
-                 part_of_all=qualified_target in needed_targets)
-    num_outputs += writer.NumOutputs()
+    part_of_all = qualified_target in needed_targets
+    digest = None
+    if manifest:
+      # The .mk file depends on the spec and on what the dependencies recorded
+      # in target_outputs and target_link_deps, which is how changes to a
+      # dependency's outputs reach its dependents.
+      digest = manifest.Digest(
+          qualified_target, base_path, output_file, spec, part_of_all,
+          generator_flags, flavor, srcdir_prefix, COMPILABLE_EXTENSIONS,
+          [(dep, target_outputs.get(dep), target_link_deps.get(dep))
+           for dep in spec.get('dependencies', [])])
 
     # Our root_makefile lives at the source root.  Compute the relative path
     # from there to the output_file for including.
@@ -2089,7 +2185,83 @@ def GenerateOutput(target_list, target_dicts, data, params):
                                               os.path.dirname(makefile_path))
     include_list.add(mkfile_rel_path)
 
+    return (base_path, output_file, spec, configs, part_of_all, digest)
+
+  # With -G make_jobs=N, the .mk files are written by N processes.
+  jobs = int(generator_flags.get('make_jobs', 1))
+  if jobs <= 1:
+    for qualified_target in target_list:
+      (base_path, output_file, spec, configs, part_of_all, digest) = \
+          PrepareTarget(qualified_target)
+      writer = MakefileWriter(generator_flags, flavor)
+      if digest and manifest.IsUpToDate(qualified_target, digest,
+                                        output_file):
+        (output, link_dep, target_num_outputs) = \
+            manifest.Result(qualified_target)
+        target_outputs[qualified_target] = output
+        if link_dep:
+          target_link_deps[qualified_target] = link_dep
+      else:
+        writer.Write(qualified_target, base_path, output_file, spec, configs,
+                     part_of_all=part_of_all)
+        target_num_outputs = writer.NumOutputs()
+        if manifest:
+          manifest.Record(qualified_target, digest, output_file,
+                          (target_outputs[qualified_target],
+                           target_link_deps.get(qualified_target),
+                           target_num_outputs))
+      num_outputs += target_num_outputs
+  else:
+    # Write the targets of each wave in the pool.  A target only needs the
+    # target_outputs and target_link_deps entries of its dependencies, which
+    # are in earlier waves.
+    pool = multiprocessing.Pool(jobs)
+    try:
+      for wave in gyp.common.ComputeWaves(target_list, target_dicts):
+        tasks = []
+        for qualified_target in wave:
+          (base_path, output_file, spec, configs, part_of_all, digest) = \
+              PrepareTarget(qualified_target)
+          if digest and manifest.IsUpToDate(qualified_target, digest,
+                                            output_file):
+            (output, link_dep, target_num_outputs) = \
+                manifest.Result(qualified_target)
+            target_outputs[qualified_target] = output
+            if link_dep:
+              target_link_deps[qualified_target] = link_dep
+            num_outputs += target_num_outputs
+            continue
+          dependency_outputs = {}
+          dependency_link_deps = {}
+          for dep in spec.get('dependencies', []):
+            dependency_outputs[dep] = target_outputs[dep]
+            if dep in target_link_deps:
+              dependency_link_deps[dep] = target_link_deps[dep]
+          tasks.append((qualified_target, digest, output_file,
+                        (dependency_outputs, dependency_link_deps,
+                         srcdir_prefix, generator_flags, flavor,
+                         qualified_target, base_path, output_file, spec,
+                         configs, part_of_all)))
+        results = pool.map(CallWriteMakefileTarget, [task[3] for task in tasks])
+        for (qualified_target, digest, output_file, _), (result, error) in \
+            zip(tasks, results):
+          if error:
+            raise error
+          if manifest:
+            manifest.Record(qualified_target, digest, output_file, result)
+          (output, link_dep, target_num_outputs) = result
+          target_outputs[qualified_target] = output
+          if link_dep:
+            target_link_deps[qualified_target] = link_dep
+          num_outputs += target_num_outputs
+    except:
+      pool.terminate()
+      raise
+    pool.close()
+    pool.join()
+
   # Write out per-gyp (sub-project) Makefiles.
+  writer = MakefileWriter(generator_flags, flavor)
   depth_rel_path = gyp.common.RelativePath(options.depth, os.getcwd())
   for build_file in build_files:
     # The paths in build_files were relativized above, so undo that before
@@ -2147,3 +2319,7 @@ def GenerateOutput(target_list, target_dicts, data, params):
   root_makefile.write(SHARED_FOOTER % { 'generate_all_deps': all_deps })
 
   root_makefile.close()
+
+  if manifest:
+    ensure_directory_exists(manifest.path)
+    manifest.Write()
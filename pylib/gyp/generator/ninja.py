@@ -5,13 +5,18 @@
 import copy
 import gyp
 import gyp.common
+import gyp.incremental
 import gyp.msvs_emulation
 import gyp.system_test
 import gyp.xcode_emulation
+import hashlib
+import multiprocessing
 import os.path
 import re
+import signal
 import subprocess
 import sys
+import threading
 
 import gyp.ninja_syntax as ninja_syntax
 
@@ -142,6 +147,84 @@ class Target:
     return self.bundle or self.binary or self.actions_stamp
 
 
+class _Pieces(list):
+  """A list that ninja_syntax.Writer can write to like a file."""
+  write = list.append
+
+
+class BufferedWriter(ninja_syntax.Writer):
+  """A ninja_syntax.Writer that keeps its text in memory and writes it to
+  output in one piece when it is closed.  ninja_syntax makes a write for every
+  line, and for every piece of a wrapped one.
+
+  A width of None turns off wrapping, which ninja_syntax has no option for.
+  """
+  def __init__(self, output, width=78):
+    if width is None:
+      # No line is this long.
+      width = sys.maxint
+    ninja_syntax.Writer.__init__(self, _Pieces(), width=width)
+    self.file = output
+
+  def close(self):
+    self.file.write(''.join(self.output))
+    self.file.close()
+
+
+class SharedDefinitions:
+  """SharedDefinitions holds the flag variables and rules of targets that are
+  defined once in build.ninja, where the .ninja files of all targets can refer
+  to them, instead of in every target's .ninja file.
+
+  Their names are derived from a hash of their definitions, so the writers of
+  different targets agree on them without having to talk to each other.
+  """
+  def __init__(self):
+    # Map from variable name to value.
+    self.variables = {}
+    # Map from rule name to (command, description, restat, pool).
+    self.rules = {}
+
+  def _Name(self, prefix, definition):
+    return '%s_%s' % (prefix, hashlib.md5(repr(definition)).hexdigest()[:16])
+
+  def Variable(self, var, value):
+    """Returns the name of a shared variable for value, or None if value
+    should be written inline.  That's the case for short values, and for
+    values that refer to other variables, which need to be expanded in the
+    scope of the target."""
+    if '$' in value.replace('$$', ''):
+      return None
+    name = self._Name(var, value)
+    if len(value) <= len(name) + 1:
+      return None
+    self.variables[name] = value
+    return name
+
+  def Rule(self, name, command, description, restat, pool):
+    """Returns the name of a shared rule with the given definition."""
+    definition = (command, description, restat, pool)
+    name = self._Name(name.replace(' ', '_'), definition)
+    self.rules[name] = definition
+    return name
+
+  def Update(self, other):
+    """Adds the definitions of other."""
+    self.variables.update(other.variables)
+    self.rules.update(other.rules)
+
+  def Write(self, ninja):
+    """Writes the definitions to the ninja_syntax.Writer ninja."""
+    if not self.variables and not self.rules:
+      return
+    for name in sorted(self.variables):
+      ninja.variable(name, self.variables[name])
+    for name in sorted(self.rules):
+      (command, description, restat, pool) = self.rules[name]
+      ninja.rule(name, command, description, restat=restat, pool=pool)
+    ninja.newline()
+
+
 # A small discourse on paths as used within the Ninja build:
 # All files we produce (both at gyp and at build time) appear in the
 # build directory (e.g. out/Debug).
@@ -168,18 +251,23 @@ class Target:
 
 class NinjaWriter:
   def __init__(self, target_outputs, base_dir, build_dir, output_file, flavor,
-               abs_build_dir=None):
+               abs_build_dir=None, width=78):
     """
     base_dir: path from source root to directory containing this gyp file,
               by gyp semantics, all input paths are relative to this
     build_dir: path from source root to build output
     abs_build_dir: absolute path to the build directory
+    width: width to wrap lines at, or None to not wrap them
     """
 
     self.target_outputs = target_outputs
     self.base_dir = base_dir
     self.build_dir = build_dir
-    self.ninja = ninja_syntax.Writer(output_file)
+    # The output is written in one piece when self.ninja is closed.
+    self.ninja = BufferedWriter(output_file, width=width)
+    # The definitions that this target shares with others through
+    # build.ninja.
+    self.shared = SharedDefinitions()
     self.flavor = flavor
     self.abs_build_dir = abs_build_dir
     self.obj_ext = '.obj' if flavor == 'win' else '.o'
@@ -350,6 +438,8 @@ class NinjaWriter:
     link_deps = []
     sources = spec.get('sources', []) + extra_sources
     if sources:
+      if int(spec.get('jumbo', 0)):
+        sources = self.WriteJumboUnits(spec, sources)
       link_deps = self.WriteSources(
           config_name, config, sources, compile_depends_stamp,
           gyp.xcode_emulation.MacPrefixHeader(
@@ -435,6 +525,7 @@ class NinjaWriter:
                                              action.get('message', None),
                                              name)
       rule_name = self.WriteNewNinjaRule(name, action['action'], description,
+                                         self.GetPool(action),
                                          env=env)
 
       inputs = [self.GypPathToNinja(i, env) for i in action['inputs']]
@@ -464,7 +555,8 @@ class NinjaWriter:
           'RULE',
           rule.get('message', None),
           ('%s ' + generator_default_variables['RULE_INPUT_PATH']) % name)
-      rule_name = self.WriteNewNinjaRule(name, args, description)
+      rule_name = self.WriteNewNinjaRule(name, args, description,
+                                         self.GetPool(rule))
 
       # TODO: if the command references the outputs directly, we should
       # simplify it to just use $out.
@@ -574,6 +666,25 @@ class NinjaWriter:
                                 ('env', env)])
     bundle_depends.append(out)
 
+  def WriteJumboUnits(self, spec, sources):
+    """Write the unity files that merge the sources of a jumbo target, and
+    return the sources to compile in place of |sources|."""
+    units, rest = gyp.common.JumboUnits(spec, sources,
+                                        objc=self.flavor == 'mac')
+    unit_sources = []
+    for i, (extension, unit) in enumerate(units):
+      unit_source = '$!INTERMEDIATE_DIR/jumbo_%d%s' % (i, extension)
+      unit_path = self.GypPathToNinja(unit_source)
+      output = OpenOutput(os.path.join(self.abs_build_dir, unit_path))
+      for source in unit:
+        path = self.GypPathToNinja(source)
+        if not os.path.isabs(path):
+          path = os.path.relpath(path, os.path.dirname(unit_path))
+        output.write('#include "%s"\n' % path)
+      output.close()
+      unit_sources.append(unit_source)
+    return unit_sources + rest
+
   def WriteSources(self, config_name, config, sources, predepends,
                    precompiled_header):
     """Write build rules to compile all of |sources|."""
@@ -932,21 +1043,24 @@ class NinjaWriter:
   def WriteVariableList(self, var, values):
     if values is None:
       values = []
-    self.ninja.variable(var, ' '.join(values))
+    value = ' '.join(values)
+    shared_name = self.shared.Variable(var, value)
+    if shared_name:
+      value = '$' + shared_name
+    self.ninja.variable(var, value)
 
-  def WriteNewNinjaRule(self, name, args, description, env={}):
-    """Write out a new ninja "rule" statement for a given command.
+  def GetPool(self, action):
+    """Returns the pool to run an action or rule in, if any."""
+    if int(action.get('ninja_link_pool', 0)):
+      return 'link_pool'
+    return None
 
-    Returns the name of the new rule."""
+  def WriteNewNinjaRule(self, name, args, description, pool, env={}):
+    """Add a ninja "rule" for a given command to the shared definitions.
+    Targets that run the same command with the same description in the same
+    pool share the rule.
 
-    # TODO: we shouldn't need to qualify names; we do it because
-    # currently the ninja rule namespace is global, but it really
-    # should be scoped to the subninja.
-    rule_name = self.name
-    if self.toolset == 'target':
-      rule_name += '.' + self.toolset
-    rule_name += '.' + name
-    rule_name = rule_name.replace(' ', '_')
+    Returns the name of the rule."""
 
     args = args[:]
 
@@ -974,10 +1088,8 @@ class NinjaWriter:
     # GYP rules/actions express being no-ops by not touching their outputs.
     # Avoid executing downstream dependencies in this case by specifying
     # restat=1 to ninja.
-    self.ninja.rule(rule_name, command, description, restat=True)
-    self.ninja.newline()
-
-    return rule_name
+    return self.shared.Rule(name, command, description, restat=True,
+                            pool=pool)
 
 
 def CalculateVariables(default_variables, params):
@@ -1022,17 +1134,86 @@ def CalculateVariables(default_variables, params):
     default_variables.setdefault('LIB_DIR', '')
 
 
+def GetLinkPoolDepth():
+  """Returns the default number of links to run at the same time: one for
+  every 4 GB of physical memory, since a big link can take that much."""
+  try:
+    memory = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+  except (AttributeError, ValueError, OSError):
+    # There's no sysconf on Windows.
+    return 1
+  return max(1, memory / (4 * 2**30))
+
+
 def OpenOutput(path):
-  """Open |path| for writing, creating directories if necessary."""
+  """Open |path| for writing, creating directories if necessary.  The file is
+  only replaced when it's closed if its contents changed, so that ninja
+  doesn't see a new file after every run of gyp."""
   try:
     os.makedirs(os.path.dirname(path))
   except OSError:
     pass
-  return open(path, 'w')
+  return gyp.common.WriteOnDiff(path)
+
+
+def WriteNinjaTarget(target_outputs, spec, config_name, flavor, base_path,
+                     build_dir, abs_build_dir, output_path, width):
+  """Writes the .ninja file for spec to output_path.  Returns its Target
+  object, or None if it has no outputs, the SharedDefinitions that
+  build.ninja needs to define for it, and whether the file changed."""
+  output = OpenOutput(output_path)
+  writer = NinjaWriter(target_outputs, base_path, build_dir, output, flavor,
+                       abs_build_dir=abs_build_dir, width=width)
+  try:
+    target = writer.WriteSpec(spec, config_name)
+  finally:
+    writer.ninja.close()
+  return (target, writer.shared, output.changed)
+
+
+def CallWriteNinjaTarget(args):
+  """Wrapper around WriteNinjaTarget for parallel generation.
+
+  This runs in a worker process.  Returns ((target, shared, changed), None),
+  or (None, exception) if writing failed.
+  """
+  try:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    return (WriteNinjaTarget(*args), None)
+  except Exception, e:
+    return (None, e)
+
+
+def WriteAutoRegenerationRule(params, master_ninja, build_to_root, flavor,
+                              build_files):
+  """Write the rule and the build statement that regenerate build.ninja when
+  one of build_files changes."""
+  options = params['options']
+  build_files_args = [gyp.common.RelativePath(filename, options.toplevel_dir)
+                      for filename in params['build_files_arg']]
+  gyp_binary = gyp.common.FixIfRelativePath(params['gyp_binary'],
+                                            options.toplevel_dir)
+  if not os.path.isabs(gyp_binary):
+    gyp_binary = os.path.join('.', gyp_binary)
+  args = [gyp_binary, '-fninja'] + gyp.RegenerateFlags(options) + \
+         build_files_args
+  if flavor == 'win':
+    command = 'cmd /c "cd %s && %s"' % (
+        build_to_root, gyp.msvs_emulation.EncodeCmdExeList(args))
+  else:
+    command = 'cd %s; %s' % (build_to_root,
+                             gyp.common.EncodePOSIXShellList(args))
+  # gyp only writes the .ninja files whose contents changed, so with restat
+  # nothing that depends on build.ninja is rebuilt if it didn't change.
+  master_ninja.rule('regen', ninja_syntax.escape(command),
+                    description='REGEN $out', generator=True, restat=True)
+  master_ninja.build('build.ninja', 'regen', sorted(build_files))
 
 
 def GenerateOutputForConfig(target_list, target_dicts, data, params,
-                            config_name):
+                            config_name, pool=None):
+  """Writes the .ninja files for config_name.  If pool is given, the .ninja
+  files of the targets are written by its worker processes."""
   options = params['options']
   flavor = gyp.common.GetFlavor(params)
   generator_flags = params.get('generator_flags', {})
@@ -1042,9 +1223,14 @@ def GenerateOutputForConfig(target_list, target_dicts, data, params,
   build_dir = os.path.join(generator_flags.get('output_dir', 'out'),
                            config_name)
 
-  master_ninja = ninja_syntax.Writer(
-      OpenOutput(os.path.join(options.toplevel_dir, build_dir, 'build.ninja')),
-      width=120)
+  # Lines are wrapped to keep the .ninja files readable.  ninja itself doesn't
+  # need that, so -G ninja_wrap_lines=0 turns it off.
+  if int(generator_flags.get('ninja_wrap_lines', 1)):
+    (master_width, width) = (120, 78)
+  else:
+    (master_width, width) = (None, None)
+  master_path = os.path.join(options.toplevel_dir, build_dir, 'build.ninja')
+  master_ninja = BufferedWriter(OpenOutput(master_path), width=master_width)
 
   # Put build-time support tools in out/{config_name}.
   gyp.common.CopyTool(flavor, os.path.join(options.toplevel_dir, build_dir))
@@ -1061,16 +1247,27 @@ def GenerateOutputForConfig(target_list, target_dicts, data, params,
     if key == 'CC': cc = os.path.join(build_to_root, value)
     if key == 'CXX': cxx = os.path.join(build_to_root, value)
 
-  flock = 'flock'
-  if flavor == 'mac':
-    flock = './gyp-mac-tool flock'
+  # Pools need ninja 1.1.
+  master_ninja.variable('ninja_required_version', '1.1')
+  master_ninja.newline()
+
+  # Links take a lot of memory, so only as many as the link pool allows run
+  # at the same time.  Actions and rules that are as heavy can ask to run in
+  # the link pool with 'ninja_link_pool': 1.  The alink rules only archive
+  # object files, which takes little memory, so they stay out of the pool.
+  # -G ninja_link_pool_depth=N sets the depth of the pool.
+  master_ninja.pool('link_pool',
+                    int(generator_flags.get('ninja_link_pool_depth',
+                                            GetLinkPoolDepth())))
+  master_ninja.newline()
+
   master_ninja.variable('ar', os.environ.get('AR', 'ar'))
   master_ninja.variable('cc', os.environ.get('CC', cc))
   master_ninja.variable('cxx', os.environ.get('CXX', cxx))
   if flavor == 'win':
     master_ninja.variable('ld', 'link')
   else:
-    master_ninja.variable('ld', flock + ' linker.lock $cxx')
+    master_ninja.variable('ld', '$cxx')
 
   master_ninja.variable('ar_target', os.environ.get('AR_target', '$ar'))
   master_ninja.variable('cc_target', os.environ.get('CC_target', '$cc'))
@@ -1078,7 +1275,7 @@ def GenerateOutputForConfig(target_list, target_dicts, data, params,
   if flavor == 'win':
     master_ninja.variable('ld_target', 'link')
   else:
-    master_ninja.variable('ld_target', flock + ' linker.lock $cxx_target')
+    master_ninja.variable('ld_target', '$cxx_target')
 
   if flavor == 'mac':
     master_ninja.variable('mac_tool', os.path.join('.', 'gyp-mac-tool'))
@@ -1126,17 +1323,20 @@ def GenerateOutputForConfig(target_list, target_dicts, data, params,
       'solink',
       description='SOLINK $out',
       command=('$ld -shared $ldflags -o $out -Wl,-soname=$soname '
-               '-Wl,--whole-archive $in -Wl,--no-whole-archive $libs'))
+               '-Wl,--whole-archive $in -Wl,--no-whole-archive $libs'),
+      pool='link_pool')
     master_ninja.rule(
       'solink_module',
       description='SOLINK(module) $out',
       command=('$ld -shared $ldflags -o $out -Wl,-soname=$soname '
-               '-Wl,--start-group $in -Wl,--end-group $libs'))
+               '-Wl,--start-group $in -Wl,--end-group $libs'),
+      pool='link_pool')
     master_ninja.rule(
       'link',
       description='LINK $out',
       command=('$ld $ldflags -o $out -Wl,-rpath=\$$ORIGIN/lib '
-               '-Wl,--start-group $in -Wl,--end-group $libs'))
+               '-Wl,--start-group $in -Wl,--end-group $libs'),
+      pool='link_pool')
   elif flavor == 'win':
     master_ninja.rule(
       'alink',
@@ -1145,15 +1345,18 @@ def GenerateOutputForConfig(target_list, target_dicts, data, params,
     master_ninja.rule(
       'solink',
       description='LINK(DLL) $dll',
-      command=('$ld /nologo /IMPLIB:$implib /DLL $ldflags /OUT:$dll $in $libs'))
+      command=('$ld /nologo /IMPLIB:$implib /DLL $ldflags /OUT:$dll $in $libs'),
+      pool='link_pool')
     master_ninja.rule(
       'solink_module',
       description='LINK(DLL) $dll',
-      command=('$ld /nologo /IMPLIB:$implib /DLL $ldflags /OUT:$dll $in $libs'))
+      command=('$ld /nologo /IMPLIB:$implib /DLL $ldflags /OUT:$dll $in $libs'),
+      pool='link_pool')
     master_ninja.rule(
       'link',
       description='LINK $out',
-      command=('$ld /nologo $ldflags /OUT:$out $in $libs'))
+      command=('$ld /nologo $ldflags /OUT:$out $in $libs'),
+      pool='link_pool')
   else:
     master_ninja.rule(
       'objc',
@@ -1179,17 +1382,20 @@ def GenerateOutputForConfig(target_list, target_dicts, data, params,
       'solink',
       description='SOLINK $out, POSTBUILDS',
       command=('$ld -shared $ldflags -o $out '
-               '$in $libs$postbuilds'))
+               '$in $libs$postbuilds'),
+      pool='link_pool')
     master_ninja.rule(
       'solink_module',
       description='SOLINK(module) $out, POSTBUILDS',
       command=('$ld -shared $ldflags -o $out '
-               '$in $libs$postbuilds'))
+               '$in $libs$postbuilds'),
+      pool='link_pool')
     master_ninja.rule(
       'link',
       description='LINK $out, POSTBUILDS',
       command=('$ld $ldflags -o $out '
-               '$in $libs$postbuilds'))
+               '$in $libs$postbuilds'),
+      pool='link_pool')
     master_ninja.rule(
       'infoplist',
       description='INFOPLIST $out',
@@ -1233,7 +1439,20 @@ def GenerateOutputForConfig(target_list, target_dicts, data, params,
 
   # target_outputs is a map from qualified target name to a Target object.
   target_outputs = {}
-  for qualified_target in target_list:
+  # The build files and the files they include, as ninja paths.
+  build_files = set()
+  # With -G incremental, only the .ninja files of targets whose inputs changed
+  # since the previous run are written.
+  manifest = None
+  if generator_flags.get('incremental'):
+    manifest = gyp.incremental.Manifest(
+        os.path.join(options.toplevel_dir, build_dir, '.gyp-incremental'))
+
+  abs_build_dir = os.path.abspath(os.path.join(options.toplevel_dir, build_dir))
+
+  def PrepareTarget(qualified_target):
+    """Returns (spec, base_path, output_file, output_path, digest) for
+    writing the .ninja file of qualified_target."""
     # qualified_target is like: third_party/icu/icu.gyp:icui18n#target
     build_file, name, toolset = \
         gyp.common.ParseQualifiedTarget(qualified_target)
@@ -1242,6 +1461,19 @@ def GenerateOutputForConfig(target_list, target_dicts, data, params,
     assert make_global_settings == this_make_global_settings, (
         "make_global_settings needs to be the same for all targets.")
 
+    for included_file in data[build_file]['included_files']:
+      # The included_files entries are relative to the dir of the build file
+      # that included them.
+      included_file = gyp.common.UnrelativePath(included_file, build_file)
+      if (params['home_dot_gyp'] and
+          os.path.abspath(included_file).startswith(params['home_dot_gyp'])):
+        # Refer to files from ~/.gyp with absolute paths, so that relocating
+        # the source dir doesn't break them.
+        build_files.add(os.path.abspath(included_file))
+      else:
+        build_files.add(os.path.join(build_to_root, gyp.common.RelativePath(
+            included_file, options.toplevel_dir)))
+
     spec = target_dicts[qualified_target]
     if flavor == 'mac':
       gyp.xcode_emulation.MergeGlobalXcodeSettingsToSpec(data[build_file], spec)
@@ -1253,35 +1485,163 @@ def GenerateOutputForConfig(target_list, target_dicts, data, params,
     if toolset != 'target':
       obj += '.' + toolset
     output_file = os.path.join(obj, base_path, name + '.ninja')
-
-    abs_build_dir=os.path.abspath(os.path.join(options.toplevel_dir, build_dir))
-    writer = NinjaWriter(target_outputs, base_path, build_dir,
-                         OpenOutput(os.path.join(options.toplevel_dir,
-                                                 build_dir,
-                                                 output_file)),
-                         flavor, abs_build_dir=abs_build_dir)
-    master_ninja.subninja(output_file)
-
-    target = writer.WriteSpec(spec, config_name)
-    if target:
-      target_outputs[qualified_target] = target
-      if qualified_target in all_targets:
-        all_outputs.add(target.FinalOutput())
+    output_path = os.path.join(options.toplevel_dir, build_dir, output_file)
+
+    digest = None
+    if manifest:
+      # The .ninja file depends on the spec and on the Target objects of the
+      # dependencies, which is how changes to a dependency's outputs reach
+      # its dependents.
+      digest = manifest.Digest(
+          spec, config_name, flavor, base_path, build_dir, abs_build_dir,
+          width, [(dep, target_outputs.get(dep))
+                  for dep in spec.get('dependencies', [])])
+    return (spec, base_path, output_file, output_path, digest)
+
+  # The definitions shared by the targets, and the .ninja file of each target.
+  shared = SharedDefinitions()
+  output_files = {}
+  # Whether the .ninja file of any target changed.
+  targets_changed = False
+  if not pool:
+    for qualified_target in target_list:
+      (spec, base_path, output_file, output_path, digest) = \
+          PrepareTarget(qualified_target)
+      output_files[qualified_target] = output_file
+      if digest and manifest.IsUpToDate(qualified_target, digest,
+                                        output_path):
+        (target, target_shared) = manifest.Result(qualified_target)
+      else:
+        (target, target_shared, changed) = WriteNinjaTarget(
+            target_outputs, spec, config_name, flavor, base_path, build_dir,
+            abs_build_dir, output_path, width)
+        targets_changed = targets_changed or changed
+        if manifest:
+          manifest.Record(qualified_target, digest, output_path,
+                          (target, target_shared))
+      shared.Update(target_shared)
+      if target:
+        target_outputs[qualified_target] = target
+  else:
+    # Write the targets of each wave in the pool.  A target only needs the
+    # Target objects of its dependencies, which are in earlier waves.
+    for wave in gyp.common.ComputeWaves(target_list, target_dicts):
+      tasks = []
+      for qualified_target in wave:
+        (spec, base_path, output_file, output_path, digest) = \
+            PrepareTarget(qualified_target)
+        output_files[qualified_target] = output_file
+        if digest and manifest.IsUpToDate(qualified_target, digest,
+                                          output_path):
+          (target, target_shared) = manifest.Result(qualified_target)
+          shared.Update(target_shared)
+          if target:
+            target_outputs[qualified_target] = target
+          continue
+        dependency_outputs = {}
+        for dep in spec.get('dependencies', []):
+          if dep in target_outputs:
+            dependency_outputs[dep] = target_outputs[dep]
+        tasks.append((qualified_target, digest, output_path,
+                      (dependency_outputs, spec, config_name, flavor,
+                       base_path, build_dir, abs_build_dir, output_path,
+                       width)))
+      results = pool.map(CallWriteNinjaTarget, [task[3] for task in tasks])
+      for (qualified_target, digest, output_path, _), (result, error) in \
+          zip(tasks, results):
+        if error:
+          raise error
+        (target, target_shared, changed) = result
+        targets_changed = targets_changed or changed
+        if manifest:
+          manifest.Record(qualified_target, digest, output_path,
+                          (target, target_shared))
+        shared.Update(target_shared)
+        if target:
+          target_outputs[qualified_target] = target
+
+  # The shared definitions have to come before the .ninja files that refer to
+  # them.
+  shared.Write(master_ninja)
+  for qualified_target in target_list:
+    master_ninja.subninja(output_files[qualified_target])
+    target = target_outputs.get(qualified_target)
+    if target and qualified_target in all_targets:
+      all_outputs.add(target.FinalOutput())
 
   if all_outputs:
     master_ninja.build('all', 'phony', list(all_outputs))
 
+  if generator_flags.get('auto_regeneration', True):
+    master_ninja.newline()
+    WriteAutoRegenerationRule(params, master_ninja, build_to_root, flavor,
+                              build_files)
+  master_ninja.close()
+
+  # After regenerating build.ninja, ninja only reads the .ninja files again if
+  # build.ninja changed, so make sure it looks changed when any of them did.
+  if targets_changed and not master_ninja.file.changed:
+    os.utime(master_path, None)
+
+  if manifest:
+    manifest.Write()
+
+
+def GenerateOutputInParallel(target_list, target_dicts, data, params,
+                             config_names, jobs):
+  """Generates config_names concurrently, each in its own thread, with the
+  .ninja files of all of their targets written by one pool of |jobs| worker
+  processes."""
+  pool = multiprocessing.Pool(jobs)
+  errors = {}
+  def GenerateConfig(config_name):
+    try:
+      GenerateOutputForConfig(target_list, target_dicts, data, params,
+                              config_name, pool)
+    except Exception:
+      errors[config_name] = sys.exc_info()
+
+  threads = []
+  for config_name in config_names:
+    thread = threading.Thread(target=GenerateConfig, args=(config_name,))
+    thread.daemon = True
+    threads.append(thread)
+  try:
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+  except KeyboardInterrupt:
+    pool.terminate()
+    raise
+
+  # Report the error that the serial loop would have run into first.
+  for config_name in config_names:
+    if config_name in errors:
+      pool.terminate()
+      exc_type, exc_value, exc_traceback = errors[config_name]
+      raise exc_type, exc_value, exc_traceback
+  pool.close()
+  pool.join()
+
 
 def GenerateOutput(target_list, target_dicts, data, params):
   if params['options'].generator_output:
     raise NotImplementedError, "--generator_output not implemented for ninja"
 
-  user_config = params.get('generator_flags', {}).get('config', None)
+  generator_flags = params.get('generator_flags', {})
+  user_config = generator_flags.get('config', None)
   if user_config:
-    GenerateOutputForConfig(target_list, target_dicts, data, params,
-                            user_config)
+    config_names = [user_config]
   else:
     config_names = target_dicts[target_list[0]]['configurations'].keys()
+
+  # With -G ninja_jobs=N, the .ninja files are written by N processes.
+  jobs = int(generator_flags.get('ninja_jobs', 1))
+  if jobs > 1:
+    GenerateOutputInParallel(target_list, target_dicts, data, params,
+                             config_names, jobs)
+  else:
     for config_name in config_names:
       GenerateOutputForConfig(target_list, target_dicts, data, params,
                               config_name)
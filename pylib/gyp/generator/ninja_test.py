@@ -38,5 +38,63 @@ class TestPrefixesAndSuffixes(unittest.TestCase):
     self.assertTrue(writer.ComputeOutputFileName(spec, 'static_library').
         endswith('.a'))
 
+class TestSharedDefinitions(unittest.TestCase):
+  def test_Variables(self):
+    shared = ninja.SharedDefinitions()
+    flags = '-Wall -Wextra -Werror -fno-exceptions -fno-rtti'
+    name = shared.Variable('cflags', flags)
+    self.assertTrue(name.startswith('cflags_'))
+    self.assertEqual(name, ninja.SharedDefinitions().Variable('cflags', flags))
+    self.assertNotEqual(name, shared.Variable('cflags_cc', flags))
+    # Short values and values that refer to other variables stay inline.
+    self.assertEqual(None, shared.Variable('cflags', '-O2'))
+    self.assertEqual(None, shared.Variable('cflags', '$cflags_c ' + flags))
+    self.assertTrue(shared.Variable('defines', '-DA=$$x ' + flags))
+
+  def test_Write(self):
+    shared = ninja.SharedDefinitions()
+    rule = shared.Rule('gen code', 'python gen.py $out', 'GEN $out', True,
+                       'link_pool')
+    self.assertTrue(rule.startswith('gen_code_'))
+    other = ninja.SharedDefinitions()
+    self.assertEqual(rule, other.Rule('gen code', 'python gen.py $out',
+                                      'GEN $out', True, 'link_pool'))
+    self.assertNotEqual(rule, ninja.SharedDefinitions().Rule(
+        'gen code', 'python gen.py $out', 'GEN $out', True, None))
+    other.Variable('ldflags', '-Wl,--as-needed -Wl,--gc-sections -pthread')
+    shared.Update(other)
+    output = StringIO.StringIO()
+    shared.Write(ninja.ninja_syntax.Writer(output))
+    lines = output.getvalue().splitlines()
+    self.assertTrue(lines[0].startswith('ldflags_'))
+    self.assertEqual(['rule ' + rule,
+                      '  command = python gen.py $out',
+                      '  description = GEN $out',
+                      '  pool = link_pool',
+                      '  restat = 1',
+                      ''], lines[1:])
+
+
+class TestBufferedWriter(unittest.TestCase):
+  def test_Buffered(self):
+    output = StringIO.StringIO()
+    output.close = lambda: None
+    writer = ninja.BufferedWriter(output)
+    writer.build('out', 'cc', ['in 1', 'in2'], order_only='dep')
+    writer.newline()
+    self.assertEqual('', output.getvalue())
+    writer.close()
+    self.assertEqual('build out: cc in$ 1 in2 || dep\n\n', output.getvalue())
+
+  def test_NoWrap(self):
+    output = StringIO.StringIO()
+    output.close = lambda: None
+    writer = ninja.BufferedWriter(output, width=None)
+    text = ' '.join(['word'] * 100)
+    writer.variable('words', text)
+    writer.comment(text)
+    writer.close()
+    self.assertEqual('words = %s\n# %s\n' % (text, text), output.getvalue())
+
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,116 @@
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+This module helps generators regenerate incrementally: it remembers a digest of
+everything that went into each target's output file, and what writing that file
+produced, so that a later run can leave unchanged targets alone.
+"""
+
+import cPickle
+import gyp
+import gyp.common
+import hashlib
+import json
+import os
+
+
+# Increment this whenever the format of the manifest changes.
+MANIFEST_VERSION = 1
+
+
+def GypVersion():
+  """Returns a digest of the gyp sources, so that upgrading gyp invalidates the
+  manifests written by an older version."""
+  return '%d-%s' % (MANIFEST_VERSION, gyp.common.GypSourceDigest())
+
+
+def _EncodeObject(obj):
+  """Lets json encode the objects that generators keep per target, such as
+  ninja's Target."""
+  if isinstance(obj, (set, frozenset)):
+    return sorted(obj)
+  if hasattr(obj, '__dict__'):
+    return obj.__dict__
+  return repr(obj)
+
+
+def _FileStamp(path):
+  """Returns the modification time and size of the file at path, or None if
+  it doesn't exist.  Another gyp invocation may have overwritten an output
+  file, so its existence alone doesn't mean it's still the one we wrote."""
+  try:
+    st = os.stat(path)
+  except OSError:
+    return None
+  return (st.st_mtime, st.st_size)
+
+
+class Manifest(object):
+  """The per-target digests and results of a generator run.
+
+  The manifest from the previous run is read when the object is created.
+  Targets that are written or found to be up to date during this run are
+  recorded, and Write replaces the manifest with them, so targets that no
+  longer exist are forgotten.
+  """
+
+  def __init__(self, path):
+    self.path = path
+    self.previous = {}
+    self.current = {}
+    self.up_to_date = 0
+    try:
+      f = open(path, 'rb')
+    except IOError:
+      return
+    try:
+      try:
+        manifest = cPickle.load(f)
+      except Exception:
+        # A damaged manifest only means that everything gets written again.
+        return
+    finally:
+      f.close()
+    if manifest.get('version') == GypVersion():
+      self.previous = manifest['targets']
+
+  def Digest(self, *inputs):
+    """Returns a digest of inputs, which should include everything that the
+    output for a target depends on."""
+    # Decoding as latin-1 can't fail, so any byte string can be encoded.
+    contents = json.dumps(inputs, sort_keys=True, default=_EncodeObject,
+                          encoding='latin-1')
+    return hashlib.sha1(contents).hexdigest()
+
+  def IsUpToDate(self, qualified_target, digest, output_path):
+    """Returns true if output_path was written for qualified_target from the
+    same inputs by the previous run, and hasn't been touched since."""
+    entry = self.previous.get(qualified_target)
+    return (entry is not None and entry[0] == digest and
+            entry[1] == _FileStamp(output_path))
+
+  def Result(self, qualified_target):
+    """Returns the result recorded for qualified_target by the previous run,
+    and records it for this run as well."""
+    entry = self.previous[qualified_target]
+    self.current[qualified_target] = entry
+    self.up_to_date += 1
+    return entry[2]
+
+  def Record(self, qualified_target, digest, output_path, result):
+    """Records the digest and result of writing output_path for
+    qualified_target."""
+    self.current[qualified_target] = (digest, _FileStamp(output_path), result)
+
+  def Write(self):
+    gyp.DebugOutput(gyp.DEBUG_GENERAL,
+                    '%d of %d targets up to date in %s' %
+                    (self.up_to_date, len(self.current), self.path))
+    f = gyp.common.WriteOnDiff(self.path)
+    try:
+      cPickle.dump({'version': GypVersion(), 'targets': self.current}, f,
+                   cPickle.HIGHEST_PROTOCOL)
+    finally:
+      f.close()
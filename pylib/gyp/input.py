@@ -2,22 +2,33 @@
 # Use of this source code is governed by a BSD-style license that can be
 # found in the LICENSE file.
 
-from compiler.ast import Const
-from compiler.ast import Dict
-from compiler.ast import Discard
-from compiler.ast import List
-from compiler.ast import Module
-from compiler.ast import Node
-from compiler.ast import Stmt
-import compiler
+import array
+import ast
+import cPickle
+import collections
 import copy
+import errno
 import gyp.common
+import gyp.profiling
+import gyp.simple_copy
+import hashlib
+import importlib
+import multiprocessing
+import multiprocessing.pool
 import optparse
 import os.path
 import re
 import shlex
+import signal
 import subprocess
 import sys
+import threading
+
+try:
+  import resource
+except ImportError:
+  # Not available on Windows.
+  resource = None
 
 
 # A list of types that are treated as linkable.
@@ -69,6 +80,9 @@ base_non_configuration_keys = [
   'default_configuration',
   'dependencies',
   'dependencies_original',
+  'jumbo',
+  'jumbo_excluded_files',
+  'jumbo_file_count',
   'link_languages',
   'libraries',
   'postbuilds',
@@ -113,6 +127,31 @@ absolute_build_file_paths = False
 multiple_toolsets = False
 
 
+def PeakMemoryUse():
+  """Returns the largest amount of memory that this process has used so far,
+  in kilobytes, or None if the platform doesn't tell."""
+  if not resource:
+    return None
+  max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  if sys.platform == 'darwin':
+    # Reported in bytes rather than kilobytes.
+    max_rss = max_rss / 1024
+  return max_rss
+
+
+def DropIncludedBuildFiles(data):
+  """Removes the dicts of included files from data.  Their contents have been
+  merged into the build files that include them, and the included_files lists
+  of those build files name them, so once all build files have been loaded,
+  only the target build files are needed."""
+  for build_file in data.keys():
+    if build_file != 'target_build_files' and \
+       build_file not in data['target_build_files']:
+      gyp.DebugOutput(gyp.DEBUG_INCLUDES,
+                      "Dropping included build file '%s'" % build_file)
+      del data[build_file]
+
+
 def GetIncludedBuildFiles(build_file_path, aux_data, included=None):
   """Return a list of all build files included into build_file_path.
 
@@ -152,49 +191,57 @@ def CheckedEval(file_contents):
   The gyp file is restricted to dictionaries and lists only, and
   repeated keys are not allowed.
 
-  Note that this is slower than eval() is.
+  The file is parsed by the same parser that eval() uses, and only the
+  resulting syntax tree is walked in Python, so this isn't much slower than
+  eval() is.
   """
 
-  ast = compiler.parse(file_contents)
-  assert isinstance(ast, Module)
-  c1 = ast.getChildren()
-  assert c1[0] is None
-  assert isinstance(c1[1], Stmt)
-  c2 = c1[1].getChildren()
-  assert isinstance(c2[0], Discard)
-  c3 = c2[0].getChildren()
-  assert len(c3) == 1
-  return CheckNode(c3[0], [])
+  syntax_tree = compile(file_contents, '<string>', 'eval', ast.PyCF_ONLY_AST)
+  return CheckNode(syntax_tree.body, [])
 
 
 def CheckNode(node, keypath):
-  if isinstance(node, Dict):
-    c = node.getChildren()
+  # keypath is the list of keys leading to node, for error messages.  It's
+  # extended while descending into node, and restored before returning.
+  node_type = type(node)
+  if node_type is ast.Str:
+    return node.s
+  elif node_type is ast.Num:
+    return node.n
+  elif node_type is ast.Dict:
     dict = {}
-    for n in range(0, len(c), 2):
-      assert isinstance(c[n], Const)
-      key = c[n].getChildren()[0]
+    for key_node, value_node in zip(node.keys, node.values):
+      if type(key_node) is not ast.Str and type(key_node) is not ast.Num:
+        raise TypeError, "Dict key must be a string or number at key path " \
+              "'%s' (line %d, column %d)" % \
+              ('.'.join(keypath), key_node.lineno, key_node.col_offset + 1)
+      key = CheckNode(key_node, keypath)
       if key in dict:
-        raise KeyError, "Key '" + key + "' repeated at level " + \
-              repr(len(keypath) + 1) + " with key path '" + \
-              '.'.join(keypath) + "'"
-      kp = list(keypath)  # Make a copy of the list for descending this node.
-      kp.append(key)
-      dict[key] = CheckNode(c[n + 1], kp)
+        raise KeyError, "Key '%s' repeated at level %d with key path '%s' " \
+              "(line %d, column %d)" % \
+              (key, len(keypath) + 1, '.'.join(keypath), key_node.lineno,
+               key_node.col_offset + 1)
+      keypath.append('%s' % key)
+      dict[key] = CheckNode(value_node, keypath)
+      keypath.pop()
     return dict
-  elif isinstance(node, List):
-    c = node.getChildren()
+  elif node_type is ast.List:
     children = []
-    for index, child in enumerate(c):
-      kp = list(keypath)  # Copy list.
-      kp.append(repr(index))
-      children.append(CheckNode(child, kp))
+    for index, child in enumerate(node.elts):
+      child_type = type(child)
+      if child_type is ast.Str:
+        children.append(child.s)
+      elif child_type is ast.Num:
+        children.append(child.n)
+      else:
+        keypath.append(repr(index))
+        children.append(CheckNode(child, keypath))
+        keypath.pop()
     return children
-  elif isinstance(node, Const):
-    return node.getChildren()[0]
   else:
-    raise TypeError, "Unknown AST node at key path '" + '.'.join(keypath) + \
-         "': " + repr(node)
+    raise TypeError, "Unknown AST node at key path '%s' (line %d, " \
+          "column %d): %s" % ('.'.join(keypath), node.lineno,
+                              node.col_offset + 1, ast.dump(node))
 
 
 def LoadOneBuildFile(build_file_path, data, aux_data, variables, includes,
@@ -202,10 +249,16 @@ def LoadOneBuildFile(build_file_path, data, aux_data, variables, includes,
   if build_file_path in data:
     return data[build_file_path]
 
-  if os.path.exists(build_file_path):
-    build_file_contents = open(build_file_path).read()
-  else:
+  try:
+    build_file = open(build_file_path)
+  except IOError, e:
+    if e.errno != errno.ENOENT:
+      raise
     raise Exception("%s not found (cwd: %s)" % (build_file_path, os.getcwd()))
+  try:
+    build_file_contents = build_file.read()
+  finally:
+    build_file.close()
 
   build_file_data = None
   try:
@@ -313,7 +366,7 @@ def ProcessToolsetsInDict(data):
       if len(toolsets) > 0:
         # Optimization: only do copies if more than one toolset is specified.
         for build in toolsets[1:]:
-          new_target = copy.deepcopy(target)
+          new_target = gyp.simple_copy.deepcopy(target)
           new_target['toolset'] = build
           new_target_list.append(new_target)
         target['toolset'] = toolsets[0]
@@ -326,13 +379,7 @@ def ProcessToolsetsInDict(data):
           ProcessToolsetsInDict(condition_dict)
 
 
-# TODO(mark): I don't love this name.  It just means that it's going to load
-# a build file that contains targets and is expected to provide a targets dict
-# that contains the targets...
-def LoadTargetBuildFile(build_file_path, data, aux_data, variables, includes,
-                        depth, check):
-  global absolute_build_file_paths
-
+def SetDepthVariable(build_file_path, variables, depth):
   # If depth is set, predefine the DEPTH variable to be a relative path from
   # this build file's directory to the directory identified by depth.
   if depth:
@@ -345,21 +392,193 @@ def LoadTargetBuildFile(build_file_path, data, aux_data, variables, includes,
     else:
       variables['DEPTH'] = d.replace('\\', '/')
 
+
+# The directory holding the load cache, or None if the cache is disabled.  The
+# load cache stores each target build file as it is after includes have been
+# merged and "pre" processing has been done, so that LoadTargetBuildFile can
+# skip that work when neither the file nor anything that contributed to it has
+# changed.
+load_cache_dir = None
+
+# Increment this whenever the contents of load cache entries change.
+LOAD_CACHE_VERSION = 1
+
+# The number of command and file list expansions done so far.  Build files
+# whose processing expanded any of them aren't cached, because their results
+# depend on more than the inputs that the cache knows about.
+command_expansion_count = 0
+
+# Map from file path to the digest of its contents, for files that the load
+# cache has looked at during this run.
+file_digests = {}
+
+
+def FileDigest(path):
+  """Returns the SHA-1 digest of the contents of the file at path."""
+  if path not in file_digests:
+    f = open(path, 'rb')
+    try:
+      file_digests[path] = hashlib.sha1(f.read()).hexdigest()
+    finally:
+      f.close()
+  return file_digests[path]
+
+
+def LoadCacheKey(build_file_path, variables, includes, depth, check):
+  """Returns the name of the load cache entry for build_file_path, given the
+  state that LoadTargetBuildFile would process it with."""
+  key = [LOAD_CACHE_VERSION, gyp.common.GypSourceDigest(),
+         build_file_path, FileDigest(build_file_path),
+         sorted(variables.items()), includes, depth, check,
+         path_sections, non_configuration_keys, multiple_toolsets]
+  return hashlib.sha1(repr(key)).hexdigest()
+
+
+def ReadLoadCacheEntry(key):
+  """Returns the load cache entry named key, or None if there is no usable
+  entry.  An entry is only usable if none of the files that contributed to it
+  have changed since it was written."""
+  try:
+    f = open(os.path.join(load_cache_dir, key + '.pickle'), 'rb')
+  except IOError:
+    return None
+  try:
+    try:
+      entry = cPickle.load(f)
+    except Exception:
+      # Treat a corrupt or truncated entry as missing; it will be rewritten.
+      return None
+  finally:
+    f.close()
+
+  for (included, digest) in entry['included']:
+    try:
+      if FileDigest(included) != digest:
+        return None
+    except IOError:
+      return None
+  return entry
+
+
+def WriteLoadCacheEntry(key, build_file_path, data, aux_data):
+  """Stores build_file_path and the files it included as the load cache entry
+  named key."""
+  included = GetIncludedBuildFiles(build_file_path, aux_data)
+  entry = {
+    'included': [(path, FileDigest(path)) for path in included],
+    'data': dict([(path, data[path]) for path in included]),
+    'aux_data': dict([(path, aux_data[path]) for path in included]),
+  }
+  f = gyp.common.WriteOnDiff(os.path.join(load_cache_dir, key + '.pickle'))
+  try:
+    cPickle.dump(entry, f, cPickle.HIGHEST_PROTOCOL)
+  finally:
+    f.close()
+
+
+# TODO(mark): I don't love this name.  It just means that it's going to load
+# a build file that contains targets and is expected to provide a targets dict
+# that contains the targets...
+def LoadTargetBuildFile(build_file_path, data, aux_data, variables, includes,
+                        depth, check, load_dependencies=True):
+  """Loads a target build file and, if load_dependencies is true, the build
+  files of all of its dependencies, recursively, and returns data.  Returns
+  None without loading anything if build_file_path has already been loaded.
+
+  When load_dependencies is false, the dependencies are not loaded.  Instead,
+  a tuple of (build_file_path, dependencies) is returned, where dependencies
+  is the list of build files that still need to be loaded, or an empty list
+  if build_file_path has already been loaded.  This is used by
+  CallLoadTargetBuildFile.
+  """
+  global absolute_build_file_paths
+
+  SetDepthVariable(build_file_path, variables, depth)
+
   # If the generator needs absolue paths, then do so.
   if absolute_build_file_paths:
     build_file_path = os.path.abspath(build_file_path)
 
   if build_file_path in data['target_build_files']:
     # Already loaded.
+    if not load_dependencies:
+      return (build_file_path, [])
     return
   data['target_build_files'].add(build_file_path)
 
   gyp.DebugOutput(gyp.DEBUG_INCLUDES,
                   "Loading Target Build File '%s'" % build_file_path)
 
+  cache_key = None
+  cache_entry = None
+  if load_cache_dir and build_file_path not in data:
+    try:
+      cache_key = LoadCacheKey(build_file_path, variables, includes, depth,
+                               check)
+      cache_entry = ReadLoadCacheEntry(cache_key)
+    except IOError:
+      # build_file_path can't be read.  LoadOneBuildFile will report it.
+      cache_key = None
+
+  with gyp.profiling.Span(build_file_path, gyp.profiling.BUILD_FILE, 'load',
+                          cached=bool(cache_entry)):
+    if cache_entry:
+      gyp.DebugOutput(gyp.DEBUG_GENERAL,
+                      "Load cache hit for '%s'" % build_file_path)
+      MergeLoadedBuildFile(build_file_path, cache_entry['data'],
+                           cache_entry['aux_data'], data, aux_data)
+      build_file_data = data[build_file_path]
+    else:
+      if cache_key:
+        gyp.DebugOutput(gyp.DEBUG_GENERAL,
+                        "Load cache miss for '%s'" % build_file_path)
+      expansion_count = command_expansion_count
+      build_file_data = ProcessTargetBuildFile(build_file_path, data,
+                                               aux_data, variables, includes,
+                                               depth, check)
+      if cache_key and command_expansion_count == expansion_count:
+        WriteLoadCacheEntry(cache_key, build_file_path, data, aux_data)
+
+  # Look for dependencies.  This means that dependency resolution occurs
+  # after "pre" conditionals and variable expansion, but before "post" -
+  # in other words, you can't put a "dependencies" section inside a "post"
+  # conditional within a target.
+
+  dependencies = []
+  if 'targets' in build_file_data:
+    for target_dict in build_file_data['targets']:
+      if 'dependencies' not in target_dict:
+        continue
+      for dependency in target_dict['dependencies']:
+        dependencies.append(
+            gyp.common.ResolveTarget(build_file_path, dependency, None)[0])
+
+  if not load_dependencies:
+    return (build_file_path, dependencies)
+
+  for dependency in dependencies:
+    try:
+      LoadTargetBuildFile(dependency, data, aux_data, variables, includes,
+                          depth, check)
+    except Exception, e:
+      gyp.common.ExceptionAppend(
+        e, 'while loading dependencies of %s' % build_file_path)
+      raise
+
+  return data
+
+
+def ProcessTargetBuildFile(build_file_path, data, aux_data, variables,
+                           includes, depth, check):
+  """Loads build_file_path with its includes into data and aux_data, and does
+  the "pre" processing for it.  Returns the processed build file dict."""
   build_file_data = LoadOneBuildFile(build_file_path, data, aux_data, variables,
                                      includes, True, check)
 
+  # Run the commands that the "pre" processing below will expand up front, so
+  # that they can run concurrently.
+  PrefetchCommands(build_file_data, build_file_path)
+
   # Store DEPTH for later use in generators.
   build_file_data['_DEPTH'] = depth
 
@@ -404,7 +623,8 @@ def LoadTargetBuildFile(build_file_path, data, aux_data, variables, includes,
         # copy with the target-specific data merged into it as the replacement
         # target dict.
         old_target_dict = build_file_data['targets'][index]
-        new_target_dict = copy.deepcopy(build_file_data['target_defaults'])
+        new_target_dict = gyp.simple_copy.deepcopy(
+            build_file_data['target_defaults'])
         MergeDicts(new_target_dict, old_target_dict,
                    build_file_path, build_file_path)
         build_file_data['targets'][index] = new_target_dict
@@ -416,27 +636,178 @@ def LoadTargetBuildFile(build_file_path, data, aux_data, variables, includes,
     # No longer needed.
     del build_file_data['target_defaults']
 
-  # Look for dependencies.  This means that dependency resolution occurs
-  # after "pre" conditionals and variable expansion, but before "post" -
-  # in other words, you can't put a "dependencies" section inside a "post"
-  # conditional within a target.
+  return build_file_data
 
-  if 'targets' in build_file_data:
-    for target_dict in build_file_data['targets']:
-      if 'dependencies' not in target_dict:
-        continue
-      for dependency in target_dict['dependencies']:
-        other_build_file = \
-            gyp.common.ResolveTarget(build_file_path, dependency, None)[0]
-        try:
-          LoadTargetBuildFile(other_build_file, data, aux_data, variables,
-                              includes, depth, check)
-        except Exception, e:
-          gyp.common.ExceptionAppend(
-            e, 'while loading dependencies of %s' % build_file_path)
-          raise
 
-  return data
+def CallLoadTargetBuildFile(global_flags, debug, build_file_path, variables,
+                            includes, depth, check):
+  """Wrapper around LoadTargetBuildFile for parallel processing.
+
+  This runs in a worker process.  It loads a single build file without its
+  dependencies and returns (build_file_path, data, aux_data, dependencies),
+  or (None, exception) if loading failed.
+  """
+  try:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # Apply the module globals that Load set up in the parent process, so that
+    # the worker behaves the same way.
+    for key, value in global_flags.iteritems():
+      globals()[key] = value
+    gyp.debug = debug
+
+    data = {'target_build_files': set()}
+    aux_data = {}
+    (build_file_path, dependencies) = \
+        LoadTargetBuildFile(build_file_path, data, aux_data, variables,
+                            includes, depth, check, False)
+    del data['target_build_files']
+    return (build_file_path, data, aux_data, dependencies)
+  except Exception, e:
+    gyp.common.ExceptionAppend(e, 'while trying to load %s' % build_file_path)
+    return (None, e)
+
+
+class ParallelState(object):
+  """Keeps track of the work done by LoadTargetBuildFilesParallel.
+
+  The pool's result handler thread delivers results through
+  LoadTargetBuildFileCallback, so all of the attributes are protected by
+  condition, which is also used to wake up the scheduling loop.
+  """
+
+  def __init__(self):
+    # The multiprocessing pool.
+    self.pool = None
+    # Condition variable protecting this object.
+    self.condition = threading.Condition()
+    # The number of build files handed to the pool and not yet returned.
+    self.pending = 0
+    # All build files that have been scheduled, so that none is loaded twice.
+    self.scheduled = set()
+    # Build files that still need to be handed to the pool.
+    self.dependencies = []
+    # Map from loaded build file to (data, aux_data, dependencies).
+    self.results = {}
+    # The first exception raised in a worker, if any.
+    self.error = None
+
+  def LoadTargetBuildFileCallback(self, result):
+    """Handles the result of CallLoadTargetBuildFile."""
+    self.condition.acquire()
+    try:
+      if result[0] is None:
+        if not self.error:
+          self.error = result[1]
+      else:
+        (build_file_path, data, aux_data, dependencies) = result
+        self.results[build_file_path] = (data, aux_data, dependencies)
+        for dependency in dependencies:
+          key = NormalizedBuildFilePath(dependency)
+          if key not in self.scheduled:
+            self.scheduled.add(key)
+            self.dependencies.append(key)
+      self.pending -= 1
+      self.condition.notify()
+    finally:
+      self.condition.release()
+
+
+def NormalizedBuildFilePath(build_file_path):
+  """Returns build_file_path as LoadTargetBuildFile will store it in data."""
+  if absolute_build_file_paths:
+    return os.path.abspath(build_file_path)
+  return build_file_path
+
+
+def LoadTargetBuildFilesParallel(build_files, data, aux_data, variables,
+                                 includes, depth, check, jobs):
+  """Loads build_files and all of their dependencies in a pool of |jobs|
+  worker processes.
+
+  The results are merged into data and aux_data in the same order that the
+  serial, depth-first LoadTargetBuildFile would have produced them, and
+  variables is left as the serial loader would leave it, so that the rest of
+  Load can't tell the difference.
+  """
+  parallel_state = ParallelState()
+  for build_file in build_files:
+    key = NormalizedBuildFilePath(build_file)
+    if key not in parallel_state.scheduled:
+      parallel_state.scheduled.add(key)
+      parallel_state.dependencies.append(key)
+
+  global_flags = {
+    'path_sections': path_sections,
+    'non_configuration_keys': non_configuration_keys,
+    'absolute_build_file_paths': absolute_build_file_paths,
+    'multiple_toolsets': multiple_toolsets,
+    'load_cache_dir': load_cache_dir,
+    'command_cache_dir': command_cache_dir,
+    'command_jobs': command_jobs,
+  }
+
+  parallel_state.pool = multiprocessing.Pool(jobs)
+  parallel_state.condition.acquire()
+  try:
+    try:
+      while parallel_state.dependencies or parallel_state.pending:
+        if parallel_state.error:
+          break
+        if not parallel_state.dependencies:
+          parallel_state.condition.wait()
+          continue
+
+        dependency = parallel_state.dependencies.pop(0)
+        parallel_state.pending += 1
+        parallel_state.pool.apply_async(
+            CallLoadTargetBuildFile,
+            args = (global_flags, gyp.debug, dependency, variables.copy(),
+                    includes, depth, check),
+            callback = parallel_state.LoadTargetBuildFileCallback)
+    finally:
+      parallel_state.condition.release()
+  except KeyboardInterrupt:
+    parallel_state.pool.terminate()
+    raise
+
+  if parallel_state.error:
+    parallel_state.pool.terminate()
+    raise parallel_state.error
+  parallel_state.pool.close()
+  parallel_state.pool.join()
+
+  # Replay the order in which the serial loader visits build files.  It
+  # determines the insertion order of data and aux_data, and the value that
+  # the last visit leaves in variables['DEPTH'].
+  results = parallel_state.results
+  def Visit(build_file_path):
+    SetDepthVariable(build_file_path, variables, depth)
+    build_file_path = NormalizedBuildFilePath(build_file_path)
+    if build_file_path in data['target_build_files']:
+      return
+    data['target_build_files'].add(build_file_path)
+    (file_data, file_aux_data, dependencies) = results[build_file_path]
+    MergeLoadedBuildFile(build_file_path, file_data, file_aux_data, data,
+                         aux_data)
+    for dependency in dependencies:
+      Visit(dependency)
+
+  for build_file in build_files:
+    Visit(build_file)
+
+
+def MergeLoadedBuildFile(build_file_path, file_data, file_aux_data, data,
+                         aux_data):
+  """Merges the data and aux_data of a build file loaded in isolation, and of
+  the files it included, into data and aux_data.  Included files that are
+  already present are kept, as LoadOneBuildFile would have done."""
+  if build_file_path in data:
+    return
+  data[build_file_path] = file_data[build_file_path]
+  aux_data[build_file_path] = file_aux_data[build_file_path]
+  for include in file_aux_data[build_file_path].get('included', []):
+    MergeLoadedBuildFile(include, file_data, file_aux_data, data, aux_data)
 
 
 # Look for the bracket that matches the first bracket seen in a
@@ -500,9 +871,279 @@ late_variable_re = re.compile(
     '(?P<content>.*?)(\]?)\))')
 
 # Global cache of results from running commands so they don't have to be run
-# more then once.
+# more then once, keyed on CommandCacheKey.
 cached_command_results = {}
 
+# The directory holding the command cache, or None if it is disabled.  The
+# command cache keeps the output of <!() and <!@() commands across runs, so it
+# may only be used when that output depends on nothing but the command, the
+# directory it runs in and the environment variables that CommandCacheKey
+# hashes.  Commands written as <!nocache() or <!@nocache() are run every time
+# they are expanded and never cached.
+command_cache_dir = None
+
+# The number of commands that PrefetchCommands runs at once.  Commands are
+# only run as they are expanded if this is less than 2.
+command_jobs = 0
+
+# The number of worker processes that PrefetchCommands runs <!pymod_do_main()
+# calls in.  They are only run in-process as they are expanded if this is less
+# than 2.
+pymod_jobs = 0
+
+# The pool of pymod_jobs worker processes, created when it's first needed.  It
+# is kept for the whole load so that the workers only import each module once.
+pymod_pool = None
+
+
+# Environment variables that are part of every command cache key, because they
+# decide which programs and modules a command runs.
+command_cache_environment = ('PATH', 'PATHEXT', 'PYTHONPATH')
+
+# Matches the environment variables that a command refers to as $NAME, ${NAME}
+# or %NAME%.
+command_environment_re = re.compile(r'\$\{?(?P<unix>[A-Za-z_][A-Za-z0-9_]*)|'
+                                    r'%(?P<windows>[A-Za-z_][A-Za-z0-9_]*)%')
+
+
+def CommandCacheKey(command_string, contents, build_file_dir):
+  """Returns the key that the result of running contents, a command string or
+  list, with command_string in build_file_dir is cached under.  The key holds
+  the absolute path of the directory the command runs in, since build_file_dir
+  is relative to wherever gyp was started, or None for the current directory.
+
+  Hashing the whole environment would stop the cache from ever being reused
+  from another shell, so only the variables in command_cache_environment, the
+  GYP_* variables and those that contents refers to are part of the key.  A
+  command whose output depends on any other variable must be written as
+  <!nocache() to be run again when it changes.
+  """
+  contents = str(contents)
+  names = set(command_cache_environment)
+  names.update(name for name in os.environ if name.startswith('GYP_'))
+  for match in command_environment_re.finditer(contents):
+    names.add(match.group('unix') or match.group('windows'))
+  environment = sorted((name, os.environ[name]) for name in names
+                       if name in os.environ)
+  environment = hashlib.sha1(repr(environment)).hexdigest()
+  cwd = os.path.abspath(build_file_dir or os.curdir)
+  return (command_string, cwd, contents, environment)
+
+
+def CommandCachePath(cache_key):
+  """Returns the path of the command cache entry for cache_key."""
+  return os.path.join(command_cache_dir,
+                      hashlib.sha1(repr(cache_key)).hexdigest() + '.pickle')
+
+
+def GetCachedCommandResult(cache_key):
+  """Returns the result cached for cache_key by this run or, if the command
+  cache is enabled, by a previous one.  Returns None if there is none."""
+  if cache_key in cached_command_results:
+    return cached_command_results[cache_key]
+  if not command_cache_dir:
+    return None
+  try:
+    f = open(CommandCachePath(cache_key), 'rb')
+  except IOError:
+    return None
+  try:
+    try:
+      (entry_key, result) = cPickle.load(f)
+    except Exception:
+      # Treat a corrupt or truncated entry as missing; it will be rewritten.
+      return None
+  finally:
+    f.close()
+  if entry_key != cache_key:
+    return None
+  cached_command_results[cache_key] = result
+  return result
+
+
+def SetCachedCommandResult(cache_key, result, persistent=True):
+  """Caches result for cache_key for the rest of this run and, if persistent
+  is true and the command cache is enabled, for later runs."""
+  cached_command_results[cache_key] = result
+  if persistent and command_cache_dir:
+    f = gyp.common.WriteOnDiff(CommandCachePath(cache_key))
+    try:
+      cPickle.dump((cache_key, result), f, cPickle.HIGHEST_PROTOCOL)
+    finally:
+      f.close()
+
+
+def RunCommand(contents, use_shell, build_file_dir):
+  """Runs contents, a shell command string if use_shell is true and an
+  argument list otherwise, in build_file_dir.  Returns a tuple of the exit
+  status and what the command wrote to stdout and stderr."""
+  # Fix up command with platform specific workarounds.
+  contents = FixupPlatformCommand(contents)
+  p = subprocess.Popen(contents, shell=use_shell,
+                       stdout=subprocess.PIPE,
+                       stderr=subprocess.PIPE,
+                       stdin=subprocess.PIPE,
+                       cwd=build_file_dir)
+  p_stdout, p_stderr = p.communicate('')
+  return (p.wait(), p_stdout, p_stderr)
+
+
+def CallRunCommand(args):
+  """Wrapper around RunCommand for PrefetchCommands.  Returns None if the
+  command couldn't be run; it is run again when it is expanded, which reports
+  the error."""
+  try:
+    return RunCommand(*args)
+  except Exception:
+    return None
+
+
+def RunPymodDoMain(contents, build_file_dir):
+  """Runs <!pymod_do_main(contents) for a build file in build_file_dir.
+
+  The first word of contents names a python module, which is imported with
+  build_file_dir as the current directory, and the rest are passed to its
+  DoMain function as a list.  Modules stay imported, so later calls only pay
+  for DoMain.  Returns what DoMain returned, as a string.
+  """
+  parsed_contents = shlex.split(contents)
+  oldwd = os.getcwd()  # Python doesn't like os.open('.'): no fchdir.
+  if build_file_dir:
+    os.chdir(build_file_dir)
+  try:
+    py_module = importlib.import_module(parsed_contents[0])
+    return str(py_module.DoMain(parsed_contents[1:])).rstrip()
+  finally:
+    os.chdir(oldwd)
+
+
+def CallRunPymodDoMain(args):
+  """Wrapper around RunPymodDoMain for the worker processes of
+  PrefetchCommands.  Returns (True, result), or (False, None) if DoMain
+  failed; it is run again in gyp's own process when it is expanded, which
+  reports the error.  That includes DoMain calling sys.exit(), which would
+  otherwise kill the worker and leave the pool waiting for its result."""
+  try:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    return (True, RunPymodDoMain(*args))
+  except BaseException:
+    return (False, None)
+
+
+def ClosePymodPool():
+  """Shuts down the worker processes that ran <!pymod_do_main() calls."""
+  global pymod_pool
+  if pymod_pool:
+    pymod_pool.close()
+    pymod_pool.join()
+    pymod_pool = None
+
+
+def TerminatePymodPool():
+  """Stops the worker processes that ran <!pymod_do_main() calls without
+  waiting for them, if ClosePymodPool hasn't already shut them down."""
+  global pymod_pool
+  if pymod_pool:
+    pymod_pool.terminate()
+    pymod_pool.join()
+    pymod_pool = None
+
+
+def FindPrefetchableCommands(item, commands):
+  """Appends the <!() and <!@() commands in item, a build file's dict, list or
+  string, that can be run before any variables are expanded to commands, as
+  (command_string, contents, use_shell) tuples.  Commands inside conditions,
+  which may never be expanded, and commands containing variable references
+  are skipped, and so are command strings other than pymod_do_main."""
+  if isinstance(item, dict):
+    for key, value in item.iteritems():
+      if key not in ('conditions', 'target_conditions'):
+        FindPrefetchableCommands(value, commands)
+  elif isinstance(item, list):
+    for value in item:
+      FindPrefetchableCommands(value, commands)
+  elif isinstance(item, str) and '<!' in item:
+    for match in early_variable_re.finditer(item):
+      command_string = match.group('command_string')
+      if ('!' not in match.group('type') or
+          command_string not in (None, 'pymod_do_main')):
+        continue
+      # Find the contents as ExpandComplexVariables does.
+      start = match.start('replace')
+      (c_start, c_end) = FindEnclosingBracketGroup(item[start:])
+      contents = item[start + c_start + 1:start + c_end - 1]
+      if c_start < 0 or '<' in contents:
+        continue
+      contents = contents.strip()
+      use_shell = True
+      if match.group('is_array'):
+        try:
+          contents = eval(contents)
+        except Exception:
+          continue
+        use_shell = False
+      commands.append((command_string, contents, use_shell))
+
+
+def PrefetchCommands(build_file_data, build_file_path):
+  """Runs the commands that expanding build_file_data will need, as far as
+  they can be known in advance, and caches their output for
+  ExpandComplexVariables.  Shell commands are run |command_jobs| at a time,
+  and <!pymod_do_main() calls in |pymod_jobs| worker processes."""
+  use_pymod_pool = (pymod_jobs > 1 and
+                    not multiprocessing.current_process().daemon)
+  if command_jobs < 2 and not use_pymod_pool:
+    return
+  build_file_dir = os.path.dirname(build_file_path) or None
+  commands = []
+  FindPrefetchableCommands(build_file_data, commands)
+  pending = {}
+  pending_pymod = {}
+  for (command_string, contents, use_shell) in commands:
+    cache_key = CommandCacheKey(command_string, contents, build_file_dir)
+    if cache_key in pending or cache_key in pending_pymod:
+      continue
+    if command_string and use_pymod_pool:
+      if cache_key not in cached_command_results:
+        pending_pymod[cache_key] = (contents, build_file_dir)
+    elif not command_string and command_jobs > 1:
+      if GetCachedCommandResult(cache_key) is None:
+        pending[cache_key] = (contents, use_shell, build_file_dir)
+
+  if pending_pymod:
+    global pymod_pool
+    if not pymod_pool:
+      pymod_pool = multiprocessing.Pool(pymod_jobs)
+    pending_pymod = pending_pymod.items()
+    # Let the workers get on with these while the shell commands run.
+    pymod_results = pymod_pool.map_async(
+        CallRunPymodDoMain, [args for (_, args) in pending_pymod])
+
+  if len(pending) > 1:
+    pending = pending.items()
+    pool = multiprocessing.pool.ThreadPool(min(command_jobs, len(pending)))
+    try:
+      results = pool.map(CallRunCommand, [args for (_, args) in pending])
+    finally:
+      pool.close()
+      pool.join()
+    for ((cache_key, (contents, _, _)), result) in zip(pending, results):
+      # Failed commands are left to ExpandComplexVariables to run and report.
+      if result and result[0] == 0 and not result[2]:
+        gyp.DebugOutput(gyp.DEBUG_VARIABLES,
+                        "Prefetched command '%s' in directory '%s'" %
+                        (contents, build_file_dir))
+        SetCachedCommandResult(cache_key, result[1].rstrip())
+
+  if pending_pymod:
+    for ((cache_key, (contents, _)), (succeeded, result)) in zip(
+        pending_pymod, pymod_results.get()):
+      if succeeded:
+        gyp.DebugOutput(gyp.DEBUG_VARIABLES,
+                        "Prefetched pymod_do_main '%s' in directory '%s'" %
+                        (contents, build_file_dir))
+        SetCachedCommandResult(cache_key, result, persistent=False)
+
 
 def FixupPlatformCommand(cmd):
   if sys.platform == 'win32':
@@ -513,7 +1154,153 @@ def FixupPlatformCommand(cmd):
   return cmd
 
 
+# Maps strings containing "<" to their parsed form for early expansion, see
+# ParseVariableReferences.
+early_expansion_templates = {}
+
+# The same as early_expansion_templates, for late expansion of strings
+# containing ">".
+late_expansion_templates = {}
+
+# Matches the names of variables that ParseVariableReferences can handle.
+simple_variable_name_re = re.compile('^[-a-zA-Z0-9_.]+$')
+
+
+def ParseVariableReferences(input_str, is_late):
+  """Parses input_str for ExpandVariables.
+
+  If input_str contains no expansions, returns it unchanged.  If every
+  expansion in input_str is a plain variable reference, such as "<(name)" or
+  "<@(name)", returns a tuple (parts, expand_to_list): the items of parts
+  alternate between literal text and variable names, starting and ending with
+  literal text, and expand_to_list is true if input_str is a single "@"
+  reference and nothing else.  Returns None for anything else, which is left
+  to ExpandComplexVariables.
+  """
+  if not is_late:
+    variable_re = early_variable_re
+    expansion_symbol = '<'
+  else:
+    variable_re = late_variable_re
+    expansion_symbol = '>'
+
+  parts = []
+  expand_to_list = False
+  position = 0
+  for match in variable_re.finditer(input_str):
+    match_type = match.group('type')
+    name = match.group('content')
+    if (match_type not in (expansion_symbol, expansion_symbol + '@') or
+        match.group('command_string') or match.group('is_array') or
+        match.group(6) or not simple_variable_name_re.match(name) or
+        IsStrCanonicalInt(name)):
+      return None
+    # The reference must be closed by its own parenthesis.
+    start = match.start()
+    if (FindEnclosingBracketGroup(input_str[start:]) !=
+        (len(match_type), match.end() - start)):
+      return None
+    if '@' in match_type and start == 0:
+      # Whether this expands to a list depends on whether everything after
+      # it expands to nothing.
+      expand_to_list = True
+    parts.append(input_str[position:start])
+    parts.append(name)
+    position = match.end()
+
+  if not parts:
+    return input_str
+  parts.append(input_str[position:])
+  if expand_to_list:
+    if len(parts) != 3:
+      return None
+    expand_to_list = parts[2] == ''
+  return (parts, expand_to_list)
+
+
 def ExpandVariables(input, is_late, variables, build_file):
+  if 'all' in gyp.debug or gyp.DEBUG_VARIABLES in gyp.debug:
+    # Only ExpandComplexVariables reports what it does.
+    return ExpandComplexVariables(input, is_late, variables, build_file)
+
+  if not is_late:
+    expansion_symbol = '<'
+    templates = early_expansion_templates
+  else:
+    expansion_symbol = '>'
+    templates = late_expansion_templates
+
+  input_str = str(input)
+  if expansion_symbol not in input_str:
+    if IsStrCanonicalInt(input_str):
+      return int(input_str)
+    return input_str
+
+  # Parse each distinct string once.
+  try:
+    template = templates[input_str]
+  except KeyError:
+    template = ParseVariableReferences(input_str, is_late)
+    templates[input_str] = template
+
+  if template is None:
+    return ExpandComplexVariables(input, is_late, variables, build_file)
+  if isinstance(template, str):
+    # There was nothing to expand after all.  This can't be an integer.
+    return template
+
+  (parts, expand_to_list) = template
+  # Replace references right-to-left, as ExpandComplexVariables does.
+  output_parts = parts[:]
+  for index in xrange(len(parts) - 2, 0, -2):
+    contents = parts[index]
+    if not contents in variables:
+      raise KeyError, 'Undefined variable ' + contents + \
+                      ' in ' + build_file
+    replacement = variables[contents]
+
+    if isinstance(replacement, list):
+      for item in replacement:
+        if not isinstance(item, str) and not isinstance(item, int):
+          raise TypeError, 'Variable ' + contents + \
+                           ' must expand to a string or list of strings; ' + \
+                           'list contains a ' + \
+                           item.__class__.__name__
+      # Run through the list and handle variable expansions in it.
+      ProcessVariablesAndConditionsInList(replacement, is_late, variables,
+                                          build_file)
+    elif not isinstance(replacement, str) and \
+         not isinstance(replacement, int):
+      raise TypeError, 'Variable ' + contents + \
+                       ' must expand to a string or list of strings; ' + \
+                       'found a ' + replacement.__class__.__name__
+
+    if expand_to_list:
+      if isinstance(replacement, list):
+        output = replacement[:]
+      else:
+        output = shlex.split(str(replacement))
+    elif isinstance(replacement, list):
+      output_parts[index] = gyp.common.EncodePOSIXShellList(replacement)
+    else:
+      output_parts[index] = str(replacement)
+
+  # The replacements may contain more references, so expand the result again,
+  # as ExpandComplexVariables does.
+  if expand_to_list:
+    output = [ExpandVariables(item, is_late, variables, build_file)
+              for item in output]
+    for index in xrange(0, len(output)):
+      if IsStrCanonicalInt(output[index]):
+        output[index] = int(output[index])
+    return output
+  return ExpandVariables(''.join(output_parts), is_late, variables, build_file)
+
+
+def ExpandComplexVariables(input, is_late, variables, build_file):
+  """Expands variables in input by scanning it for expansions repeatedly.  This
+  handles everything, including commands, file lists and nested expansions.
+  ExpandVariables uses it for the strings that it can't handle itself."""
   # Look for the pattern that gets expanded into variables
   if not is_late:
     variable_re = early_variable_re
@@ -605,6 +1392,9 @@ def ExpandVariables(input, is_late, variables, build_file):
       expand_to_list = '@' in match['type'] and input_str == replacement
 
       if run_command or file_list:
+        global command_expansion_count
+        command_expansion_count += 1
+
         # Find the build file's directory, so commands can be run or file lists
         # generated relative to it.
         build_file_dir = os.path.dirname(build_file)
@@ -639,19 +1429,15 @@ def ExpandVariables(input, is_late, variables, build_file):
           contents = eval(contents)
           use_shell = False
 
-        # Check for a cached value to avoid executing commands, or generating
-        # file lists more than once.
-        # TODO(http://code.google.com/p/gyp/issues/detail?id=112): It is
-        # possible that the command being invoked depends on the current
-        # directory. For that case the syntax needs to be extended so that the
-        # directory is also used in cache_key (it becomes a tuple).
-        # TODO(http://code.google.com/p/gyp/issues/detail?id=111): In theory,
-        # someone could author a set of GYP files where each time the command
-        # is invoked it produces different output by design. When the need
-        # arises, the syntax should be extended to support no caching off a
-        # command's output so it is run every time.
-        cache_key = str(contents)
-        cached_value = cached_command_results.get(cache_key, None)
+        # Check for a cached value to avoid executing commands more than once,
+        # unless the command asks to be run every time with <!nocache().
+        # The directory and the environment the command runs in are part of
+        # the key, since they may change its output.
+        use_cache = command_string != 'nocache'
+        cache_key = CommandCacheKey(command_string, contents, build_file_dir)
+        cached_value = None
+        if use_cache:
+          cached_value = GetCachedCommandResult(cache_key)
         if cached_value is None:
           gyp.DebugOutput(gyp.DEBUG_VARIABLES,
                           "Executing command '%s' in directory '%s'" %
@@ -665,38 +1451,26 @@ def ExpandVariables(input, is_late, variables, build_file):
             # passing ["param", "eters"] as a single list argument. For modules
             # that don't load quickly, this can be faster than
             # <!(python modulename param eters). Do this in |build_file_dir|.
-            oldwd = os.getcwd()  # Python doesn't like os.open('.'): no fchdir.
-            os.chdir(build_file_dir)
-
-            parsed_contents = shlex.split(contents)
-            py_module = __import__(parsed_contents[0])
-            replacement = str(py_module.DoMain(parsed_contents[1:])).rstrip()
-
-            os.chdir(oldwd)
-            assert replacement != None
-          elif command_string:
+            replacement = RunPymodDoMain(contents, build_file_dir)
+          elif command_string and use_cache:
             raise Exception("Unknown command string '%s' in '%s'." %
                             (command_string, contents))
           else:
-            # Fix up command with platform specific workarounds.
-            contents = FixupPlatformCommand(contents)
-            p = subprocess.Popen(contents, shell=use_shell,
-                                 stdout=subprocess.PIPE,
-                                 stderr=subprocess.PIPE,
-                                 stdin=subprocess.PIPE,
-                                 cwd=build_file_dir)
-
-            p_stdout, p_stderr = p.communicate('')
-
-            if p.wait() != 0 or p_stderr:
+            (returncode, p_stdout, p_stderr) = RunCommand(contents, use_shell,
+                                                          build_file_dir)
+            if returncode != 0 or p_stderr:
               sys.stderr.write(p_stderr)
               # Simulate check_call behavior, since check_call only exists
               # in python 2.5 and later.
               raise Exception("Call to '%s' returned exit status %d." %
-                              (contents, p.returncode))
+                              (FixupPlatformCommand(contents), returncode))
             replacement = p_stdout.rstrip()
 
-          cached_command_results[cache_key] = replacement
+          if use_cache:
+            # The output of a python module depends on its code, which the
+            # key doesn't cover, so only keep it for this run.
+            SetCachedCommandResult(cache_key, replacement,
+                                   persistent=not command_string)
         else:
           gyp.DebugOutput(gyp.DEBUG_VARIABLES,
                           "Had cache value for command '%s' in directory '%s'" %
@@ -784,6 +1558,110 @@ def ExpandVariables(input, is_late, variables, build_file):
   return output
 
 
+# Maps condition strings, after variable expansion, to the functions that
+# evaluate them, see CompileCondition.  The cache is emptied when it holds
+# condition_cache_size conditions, which a tree doesn't normally get near.
+cached_conditions = {}
+condition_cache_size = 4096
+
+# Statistics about cached_conditions, for debug output.
+condition_cache_hits = 0
+condition_cache_misses = 0
+fast_conditions = 0
+
+
+def FastConditionEvaluator(node):
+  """Returns a function that evaluates the parsed condition node against a
+  variables dict the same way eval would, or None if the condition uses
+  anything but variable names, string and number literals, ==, !=, and, or and
+  not.  These cover nearly all conditions, and skipping eval for them is much
+  faster."""
+  if isinstance(node, ast.Expression):
+    return FastConditionEvaluator(node.body)
+
+  if isinstance(node, ast.Name):
+    name = node.id
+    if name.startswith('__'):
+      # eval could find these in its globals.
+      return None
+    if name in ('None', 'True', 'False'):
+      # eval treats None as a constant, and finds True and False as it would
+      # find builtins, so leave these to it.
+      return None
+    def Variable(variables):
+      try:
+        return variables[name]
+      except KeyError:
+        raise NameError("name '%s' is not defined" % name)
+    return Variable
+
+  if isinstance(node, (ast.Str, ast.Num)):
+    if isinstance(node, ast.Str):
+      value = node.s
+    else:
+      value = node.n
+    return lambda variables: value
+
+  if isinstance(node, ast.Compare) and len(node.ops) == 1:
+    left = FastConditionEvaluator(node.left)
+    right = FastConditionEvaluator(node.comparators[0])
+    if left is None or right is None:
+      return None
+    if isinstance(node.ops[0], ast.Eq):
+      return lambda variables: left(variables) == right(variables)
+    if isinstance(node.ops[0], ast.NotEq):
+      return lambda variables: left(variables) != right(variables)
+    return None
+
+  if isinstance(node, ast.BoolOp):
+    operands = [FastConditionEvaluator(value) for value in node.values]
+    if None in operands:
+      return None
+    stop_on = isinstance(node.op, ast.Or)
+    def BoolOp(variables):
+      for operand in operands:
+        value = operand(variables)
+        if bool(value) == stop_on:
+          break
+      return value
+    return BoolOp
+
+  if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+    operand = FastConditionEvaluator(node.operand)
+    if operand is None:
+      return None
+    return lambda variables: not operand(variables)
+
+  return None
+
+
+def CompileCondition(cond_expr):
+  """Returns a function that takes the variables dict and returns the value of
+  the condition cond_expr.  Raises SyntaxError if cond_expr isn't a valid
+  expression."""
+  global condition_cache_hits, condition_cache_misses, fast_conditions
+  try:
+    evaluator = cached_conditions[cond_expr]
+    condition_cache_hits += 1
+    return evaluator
+  except KeyError:
+    pass
+
+  condition_cache_misses += 1
+  tree = compile(cond_expr, '<string>', 'eval', ast.PyCF_ONLY_AST)
+  evaluator = FastConditionEvaluator(tree)
+  if evaluator is None:
+    code = compile(tree, '<string>', 'eval')
+    evaluator = lambda variables: eval(code, {'__builtins__': None}, variables)
+  else:
+    fast_conditions += 1
+
+  if len(cached_conditions) >= condition_cache_size:
+    cached_conditions.clear()
+  cached_conditions[cond_expr] = evaluator
+  return evaluator
+
+
 def ProcessConditionsInDict(the_dict, is_late, variables, build_file):
   # Process a 'conditions' or 'target_conditions' section in the_dict,
   # depending on is_late.  If is_late is False, 'conditions' is used.
@@ -837,9 +1715,7 @@ def ProcessConditionsInDict(the_dict, is_late, variables, build_file):
             'only, found ' + expanded.__class__.__name__
 
     try:
-      ast_code = compile(cond_expr_expanded, '<string>', 'eval')
-
-      if eval(ast_code, {'__builtins__': None}, variables):
+      if CompileCondition(cond_expr_expanded)(variables):
         merge_dict = true_dict
       else:
         merge_dict = false_dict
@@ -863,6 +1739,70 @@ def ProcessConditionsInDict(the_dict, is_late, variables, build_file):
       MergeDicts(the_dict, merge_dict, build_file, build_file)
 
 
+class VariableScope(object):
+  """The variables visible in a dict being processed by
+  ProcessVariablesAndConditionsInDict.
+
+  A scope behaves like a copy of the variables dict that it was created from,
+  its parent, but doesn't copy it: variables set in the scope are stored in an
+  overlay that is searched before the parent.  The parent must not change
+  while the scope is in use.
+  """
+
+  def __init__(self, parent):
+    self.local = {}
+    if isinstance(parent, VariableScope):
+      self.maps = (self.local,) + parent.maps
+    else:
+      self.maps = (self.local, parent)
+
+  def __getitem__(self, key):
+    for variables in self.maps:
+      if key in variables:
+        return variables[key]
+    raise KeyError, key
+
+  def __setitem__(self, key, value):
+    self.local[key] = value
+
+  def __contains__(self, key):
+    for variables in self.maps:
+      if key in variables:
+        return True
+    return False
+
+  def get(self, key, default=None):
+    for variables in self.maps:
+      if key in variables:
+        return variables[key]
+    return default
+
+  def copy(self):
+    """Returns the variables in the scope as a new dict."""
+    result = {}
+    for variables in reversed(self.maps):
+      result.update(variables)
+    return result
+
+  def __deepcopy__(self, memo):
+    return copy.deepcopy(self.copy(), memo)
+
+  def keys(self):
+    return self.copy().keys()
+
+  def items(self):
+    return self.copy().items()
+
+  def iteritems(self):
+    return self.copy().iteritems()
+
+  def __iter__(self):
+    return iter(self.copy())
+
+  def __len__(self):
+    return len(self.copy())
+
+
 def LoadAutomaticVariablesFromDict(variables, the_dict):
   # Any keys with plain string values in the_dict become automatic variables.
   # The variable name is the key name with a "_" character prepended.
@@ -910,9 +1850,9 @@ def ProcessVariablesAndConditionsInDict(the_dict, is_late, variables_in,
   by this function.
   """
 
-  # Make a copy of the variables_in dict that can be modified during the
+  # Make a scope on top of variables_in that can be modified during the
   # loading of automatics and the loading of the variables dict.
-  variables = variables_in.copy()
+  variables = VariableScope(variables_in)
   LoadAutomaticVariablesFromDict(variables, the_dict)
 
   if 'variables' in the_dict:
@@ -925,7 +1865,7 @@ def ProcessVariablesAndConditionsInDict(the_dict, is_late, variables_in,
 
     # Handle the associated variables dict first, so that any variable
     # references within can be resolved prior to using them as variables.
-    # Pass a copy of the variables dict to avoid having it be tainted.
+    # It gets a scope of its own to avoid having this one be tainted.
     # Otherwise, it would have extra automatics added for everything that
     # should just be an ordinary variable in this scope.
     ProcessVariablesAndConditionsInDict(the_dict['variables'], is_late,
@@ -945,7 +1885,7 @@ def ProcessVariablesAndConditionsInDict(the_dict, is_late, variables_in,
 
   # Variable expansion may have resulted in changes to automatics.  Reload.
   # TODO(mark): Optimization: only reload if no changes were made.
-  variables = variables_in.copy()
+  variables = VariableScope(variables_in)
   LoadAutomaticVariablesFromDict(variables, the_dict)
   LoadVariablesFromVariablesDict(variables, the_dict, the_dict_key)
 
@@ -985,7 +1925,7 @@ def ProcessVariablesAndConditionsInDict(the_dict, is_late, variables_in,
 
   # Conditional processing may have resulted in changes to automatics or the
   # variables dict.  Reload.
-  variables = variables_in.copy()
+  variables = VariableScope(variables_in)
   LoadAutomaticVariablesFromDict(variables, the_dict)
   LoadVariablesFromVariablesDict(variables, the_dict, the_dict_key)
 
@@ -997,7 +1937,7 @@ def ProcessVariablesAndConditionsInDict(the_dict, is_late, variables_in,
     if key == 'variables' or isinstance(value, str):
       continue
     if isinstance(value, dict):
-      # Pass a copy of the variables dict so that subdicts can't influence
+      # Subdicts get scopes of their own, so that they can't influence
       # parents.
       ProcessVariablesAndConditionsInDict(value, is_late, variables,
                                           build_file, key)
@@ -1020,8 +1960,8 @@ def ProcessVariablesAndConditionsInList(the_list, is_late, variables,
   while index < len(the_list):
     item = the_list[index]
     if isinstance(item, dict):
-      # Make a copy of the variables dict so that it won't influence anything
-      # outside of its own scope.
+      # The dict gets a scope of its own, so that it won't influence anything
+      # outside of it.
       ProcessVariablesAndConditionsInDict(item, is_late, variables, build_file)
     elif isinstance(item, list):
       ProcessVariablesAndConditionsInList(item, is_late, variables, build_file)
@@ -1208,37 +2148,40 @@ class DependencyGraphNode(object):
     # dependents.
     flat_list = []
 
-    # in_degree_zeros is the list of DependencyGraphNodes that have no
+    # in_degree_zeros is the queue of DependencyGraphNodes that have no
     # dependencies not in flat_list.  Initially, it is a copy of the children
     # of this node, because when the graph was built, nodes with no
     # dependencies were made implicit dependents of the root node.
-    in_degree_zeros = self.dependents[:]
+    in_degree_zeros = collections.deque(self.dependents)
+
+    # unflattened maps each dependent seen so far to the number of its
+    # distinct dependencies that are not yet in flat_list.  It is set up when
+    # the first of those dependencies is added to flat_list.
+    unflattened = {}
+    flattened = set()
 
     while in_degree_zeros:
       # Nodes in in_degree_zeros have no dependencies not in flat_list, so they
-      # can be appended to flat_list.  Take these nodes out of in_degree_zeros
-      # as work progresses, so that the next node to process from the list can
-      # always be accessed at a consistent position.
-      node = in_degree_zeros.pop(0)
+      # can be appended to flat_list.  Take them from the front of the queue so
+      # that nodes are flattened in the order in which they became ready.
+      node = in_degree_zeros.popleft()
       flat_list.append(node.ref)
-
-      # Look at dependents of the node just added to flat_list.  Some of them
-      # may now belong in in_degree_zeros.
+      first_visit = node not in flattened
+      flattened.add(node)
+
+      # Look at dependents of the node just added to flat_list.  Those whose
+      # dependencies are now all in flat_list belong in in_degree_zeros.  A
+      # dependent with one or more dependencies not in flat_list will get
+      # another chance when those dependencies are added, provided that there
+      # are no cycles.
+      counted = set()
       for node_dependent in node.dependents:
-        is_in_degree_zero = True
-        for node_dependent_dependency in node_dependent.dependencies:
-          if not node_dependent_dependency.ref in flat_list:
-            # The dependent one or more dependencies not in flat_list.  There
-            # will be more chances to add it to flat_list when examining
-            # it again as a dependent of those other dependencies, provided
-            # that there are no cycles.
-            is_in_degree_zero = False
-            break
-
-        if is_in_degree_zero:
-          # All of the dependent's dependencies are already in flat_list.  Add
-          # it to in_degree_zeros where it will be processed in a future
-          # iteration of the outer loop.
+        if node_dependent not in unflattened:
+          unflattened[node_dependent] = len(set(node_dependent.dependencies))
+        if first_visit and node_dependent not in counted:
+          counted.add(node_dependent)
+          unflattened[node_dependent] -= 1
+        if unflattened[node_dependent] == 0:
           in_degree_zeros.append(node_dependent)
 
     return flat_list
@@ -1386,6 +2329,125 @@ class DependencyGraphNode(object):
     return dependencies
 
 
+class DependencyClosures(object):
+  """Computes the deep and link dependencies of every target in a dependency
+  graph once, and remembers them for the dependent settings passes and
+  AdjustStaticLibraryDependencies.
+
+  The results are the same as those of DependencyGraphNode.DeepDependencies
+  and DependencyGraphNode.LinkDependencies, which walk the graph again for
+  every target.  Here targets are numbered by their position in flat_list, and
+  each target's closure is built by merging the closures of its direct
+  dependencies, which are always computed before it.  This gives the same
+  order as the depth-first walk, because when the walk reaches a dependency
+  that it has already seen, everything below that dependency has been seen
+  too.
+
+  Link dependencies depend on the types of the targets.  They're computed
+  when first asked for, after the settings passes that come before the
+  link_settings pass have been merged in.
+  """
+
+  def __init__(self, flat_list, targets, dependency_nodes):
+    self.flat_list = flat_list
+    self.targets = targets
+    index = dict([(target, i) for (i, target) in enumerate(flat_list)])
+    # The direct dependencies of each target, by index.  The root node, which
+    # has a ref of None, is left out.
+    self.direct = []
+    for target in flat_list:
+      dependencies = dependency_nodes[target].dependencies
+      self.direct.append([index[dependency.ref] for dependency in dependencies
+                          if dependency.ref != None])
+    self.index = index
+    self.deep = None
+    self.link = None
+    # Scratch space flagging the targets already in the closure being built.
+    self.marked = bytearray(len(flat_list))
+
+  def _Merge(self, result, dependencies, closures, include_dependencies):
+    """Appends the items of closures[dependency] for each of dependencies that
+    aren't already in result to it, each preceded by dependency itself if
+    include_dependencies is true.  self.marked must flag the items in
+    result."""
+    marked = self.marked
+    for dependency in dependencies:
+      if marked[dependency]:
+        continue
+      if include_dependencies:
+        marked[dependency] = 1
+        result.append(dependency)
+      for item in closures[dependency]:
+        if not marked[item]:
+          marked[item] = 1
+          result.append(item)
+
+  def _Unmark(self, result):
+    for item in result:
+      self.marked[item] = 0
+
+  def _TargetType(self, i):
+    target_dict = self.targets[self.flat_list[i]]
+    if not 'target_name' in target_dict:
+      raise Exception("Missing 'target_name' field in target.")
+    try:
+      return target_dict['type']
+    except KeyError, e:
+      raise Exception("Missing 'type' field in target %s" %
+                      target_dict['target_name'])
+
+  def _ComputeDeepDependencies(self):
+    self.deep = []
+    for i in xrange(len(self.flat_list)):
+      result = array.array('i')
+      self._Merge(result, self.direct[i], self.deep, True)
+      self._Unmark(result)
+      self.deep.append(result)
+
+  def _ComputeLinkDependencies(self):
+    # self.link[i] is what LinkDependencies collects below target i when it
+    # is reached from a dependent, rather than being the initial target.
+    self.link = []
+    for i in xrange(len(self.flat_list)):
+      target_type = self._TargetType(i)
+      result = array.array('i')
+      if (target_type == 'none' and
+          not self.targets[self.flat_list[i]].get('dependencies_traverse',
+                                                  True)):
+        # Don't traverse 'none' targets if explicitly excluded.
+        result.append(i)
+      elif target_type not in ('executable', 'loadable_module'):
+        # Executables and loadable modules are already fully and finally
+        # linked, so they contribute nothing.  Other targets contribute
+        # themselves and, unless they're linkable, their link dependencies.
+        result.append(i)
+        if target_type not in linkable_types:
+          self.marked[i] = 1
+          self._Merge(result, self.direct[i], self.link, False)
+          self._Unmark(result)
+      self.link.append(result)
+
+  def DeepDependencies(self, target):
+    """Returns a list of all of a target's dependencies, recursively."""
+    if self.deep is None:
+      self._ComputeDeepDependencies()
+    return [self.flat_list[i] for i in self.deep[self.index[target]]]
+
+  def LinkDependencies(self, target):
+    """Returns a list of dependency targets that are linked into this target,
+    starting with the target itself if it's linkable."""
+    if self.link is None:
+      self._ComputeLinkDependencies()
+    i = self.index[target]
+    if self._TargetType(i) not in linkable_types:
+      return []
+    result = array.array('i', [i])
+    self.marked[i] = 1
+    self._Merge(result, self.direct[i], self.link, False)
+    self._Unmark(result)
+    return [self.flat_list[item] for item in result]
+
+
 def BuildDependencyList(targets):
   # Create a DependencyGraphNode for each target.  Put it into a dict for easy
   # access.
@@ -1479,21 +2541,22 @@ def VerifyNoGYPFileCircularDependencies(targets):
         ' '.join(bad_files)
 
 
-def DoDependentSettings(key, flat_list, targets, dependency_nodes):
+def DoDependentSettings(key, flat_list, targets, dependency_nodes, closures):
   # key should be one of all_dependent_settings, direct_dependent_settings,
-  # or link_settings.
+  # or link_settings.  closures is the DependencyClosures for
+  # dependency_nodes.
 
   for target in flat_list:
     target_dict = targets[target]
     build_file = gyp.common.BuildFile(target)
 
     if key == 'all_dependent_settings':
-      dependencies = dependency_nodes[target].DeepDependencies()
+      dependencies = closures.DeepDependencies(target)
     elif key == 'direct_dependent_settings':
       dependencies = \
           dependency_nodes[target].DirectAndImportedDependencies(targets)
     elif key == 'link_settings':
-      dependencies = dependency_nodes[target].LinkDependencies(targets)
+      dependencies = closures.LinkDependencies(target)
     else:
       raise KeyError, "DoDependentSettings doesn't know how to determine " + \
                       'dependencies for ' + key
@@ -1508,7 +2571,7 @@ def DoDependentSettings(key, flat_list, targets, dependency_nodes):
 
 
 def AdjustStaticLibraryDependencies(flat_list, targets, dependency_nodes,
-                                    sort_dependencies):
+                                    closures, sort_dependencies):
   # Recompute target "dependencies" properties.  For each static library
   # target, remove "dependencies" entries referring to other static libraries,
   # unless the dependency has the "hard_dependency" attribute set.  For each
@@ -1566,7 +2629,7 @@ def AdjustStaticLibraryDependencies(flat_list, targets, dependency_nodes,
       # target.  Add them to the dependencies list if they're not already
       # present.
 
-      link_dependencies = dependency_nodes[target].LinkDependencies(targets)
+      link_dependencies = closures.LinkDependencies(target)
       for dependency in link_dependencies:
         if dependency == target:
           continue
@@ -1618,79 +2681,95 @@ def MakePathRelative(to_file, fro_file, item):
       ret += '/'
     return ret
 
+def CopyListItem(item, to_file, fro_file, is_paths):
+  """Returns (to_item, singleton), where to_item is a copy of item to be merged
+  into a list from fro_file to one in to_file, and singleton is true if item
+  can only appear once in such a list."""
+  if isinstance(item, str) or isinstance(item, int):
+    # The cheap and easy case.
+    if is_paths:
+      to_item = MakePathRelative(to_file, fro_file, item)
+    else:
+      to_item = item
+
+    # Any string that doesn't begin with a "-" is a singleton - it can only
+    # appear once in a list, to be enforced by the list merge append or
+    # prepend.
+    return (to_item, not isinstance(item, str) or not item.startswith('-'))
+
+  if isinstance(item, dict):
+    # Make a copy of the dictionary, continuing to look for paths to fix.
+    # The other intelligent aspects of merge processing won't apply because
+    # item is being merged into an empty dict.
+    to_item = {}
+    MergeDicts(to_item, item, to_file, fro_file)
+  elif isinstance(item, list):
+    # Recurse, making a copy of the list.  If the list contains any
+    # descendant dicts, path fixing will occur.  Note that here, custom
+    # values for is_paths and append are dropped; those are only to be
+    # applied to |to| and |fro|, not sublists of |fro|.  append shouldn't
+    # matter anyway because the new |to_item| list is empty.
+    to_item = []
+    MergeLists(to_item, item, to_file, fro_file)
+  else:
+    raise TypeError, \
+        'Attempt to merge list item of unsupported type ' + \
+        item.__class__.__name__
+  return (to_item, False)
+
+
 def MergeLists(to, fro, to_file, fro_file, is_paths=False, append=True):
-  def is_hashable(x):
-    try:
-      hash(x)
-    except TypeError:
-      return False
-    return True
-  # If x is hashable, returns whether x is in s. Else returns whether x is in l.
-  def is_in_set_or_list(x, s, l):
-    if is_hashable(x):
-      return x in s
-    return x in l
-
-  prepend_index = 0
-
-  # Make membership testing of hashables in |to| (in particular, strings)
-  # faster.
-  hashable_to_set = set([x for x in to if is_hashable(x)])
-
-  for item in fro:
-    singleton = False
-    if isinstance(item, str) or isinstance(item, int):
-      # The cheap and easy case.
-      if is_paths:
-        to_item = MakePathRelative(to_file, fro_file, item)
-      else:
-        to_item = item
+  # Singletons are strings and ints, so only the items of |to| that aren't
+  # dicts or lists can be equal to them.  Membership is tested in a set of
+  # those items, which is built when the first singleton needs it.
+  if append:
+    to_set = None
+    for item in fro:
+      (to_item, singleton) = CopyListItem(item, to_file, fro_file, is_paths)
+      if singleton:
+        if to_set is None:
+          to_set = set([x for x in to if not isinstance(x, (dict, list))])
+        # If appending a singleton that's already in the list, don't append.
+        # This ensures that the earliest occurrence of the item will stay put.
+        if to_item in to_set:
+          continue
+        to_set.add(to_item)
+      to.append(to_item)
+    return
 
-      if not isinstance(item, str) or not item.startswith('-'):
-        # Any string that doesn't begin with a "-" is a singleton - it can
-        # only appear once in a list, to be enforced by the list merge append
-        # or prepend.
-        singleton = True
-    elif isinstance(item, dict):
-      # Make a copy of the dictionary, continuing to look for paths to fix.
-      # The other intelligent aspects of merge processing won't apply because
-      # item is being merged into an empty dict.
-      to_item = {}
-      MergeDicts(to_item, item, to_file, fro_file)
-    elif isinstance(item, list):
-      # Recurse, making a copy of the list.  If the list contains any
-      # descendant dicts, path fixing will occur.  Note that here, custom
-      # values for is_paths and append are dropped; those are only to be
-      # applied to |to| and |fro|, not sublists of |fro|.  append shouldn't
-      # matter anyway because the new |to_item| list is empty.
-      to_item = []
-      MergeLists(to_item, item, to_file, fro_file)
-    else:
-      raise TypeError, \
-          'Attempt to merge list item of unsupported type ' + \
-          item.__class__.__name__
-
-    if append:
-      # If appending a singleton that's already in the list, don't append.
-      # This ensures that the earliest occurrence of the item will stay put.
-      if not singleton or not is_in_set_or_list(to_item, hashable_to_set, to):
-        to.append(to_item)
-        if is_hashable(to_item):
-          hashable_to_set.add(to_item)
-    else:
-      # If prepending a singleton that's already in the list, remove the
-      # existing instance and proceed with the prepend.  This ensures that the
-      # item appears at the earliest possible position in the list.
-      while singleton and to_item in to:
-        to.remove(to_item)
+  # Prepend the items in their original order, rather than inserting each at
+  # index 0, which would reverse them.  If prepending a singleton that's
+  # already in the list, remove the existing instance, so that the item
+  # appears at the earliest possible position in the list.  The list is
+  # rebuilt once, rather than modified for every item.
+  prepended = []
+  prepended_singletons = set()
+  for index in xrange(len(fro)):
+    (to_item, singleton) = \
+        CopyListItem(fro[index], to_file, fro_file, is_paths)
+    if singleton:
+      if to_item in prepended_singletons:
+        break
+      prepended_singletons.add(to_item)
+    prepended.append(to_item)
+  else:
+    index = len(fro)
+  if prepended_singletons:
+    to[:] = prepended + [x for x in to if isinstance(x, (dict, list)) or
+                                          not x in prepended_singletons]
+  else:
+    to[:0] = prepended
 
-      # Don't just insert everything at index 0.  That would prepend the new
-      # items to the list in reverse order, which would be an unwelcome
-      # surprise.
-      to.insert(prepend_index, to_item)
-      if is_hashable(to_item):
-        hashable_to_set.add(to_item)
-      prepend_index = prepend_index + 1
+  # |fro| contains the same singleton more than once.  Prepending it again
+  # removes it from before the insertion point, which has always shifted the
+  # rest of |fro| one item further back.  Keep doing that, one item at a time.
+  prepend_index = len(prepended)
+  for item in fro[index:]:
+    (to_item, singleton) = CopyListItem(item, to_file, fro_file, is_paths)
+    while singleton and to_item in to:
+      to.remove(to_item)
+    to.insert(prepend_index, to_item)
+    prepend_index = prepend_index + 1
 
 
 def MergeDicts(to, fro, to_file, fro_file):
@@ -1835,32 +2914,37 @@ def SetUpConfigurations(target, target_dict):
                 if not target_dict['configurations'][i].get('abstract')]
     target_dict['default_configuration'] = sorted(concrete)[0]
 
-  for configuration in target_dict['configurations'].keys():
-    old_configuration_dict = target_dict['configurations'][configuration]
-    # Skip abstract configurations (saves work only).
-    if old_configuration_dict.get('abstract'):
-      continue
-    # Configurations inherit (most) settings from the enclosing target scope.
-    # Get the inheritance relationship right by making a copy of the target
-    # dict.
-    new_configuration_dict = copy.deepcopy(target_dict)
-
-    # Take out the bits that don't belong in a "configurations" section.
-    # Since configuration setup is done before conditional, exclude, and rules
-    # processing, be careful with handling of the suffix characters used in
-    # those phases.
-    delete_keys = []
-    for key in new_configuration_dict:
-      key_ext = key[-1:]
-      if key_ext in key_suffixes:
-        key_base = key[:-1]
-      else:
-        key_base = key
-      if key_base in non_configuration_keys:
-        delete_keys.append(key)
-
-    for key in delete_keys:
-      del new_configuration_dict[key]
+  # Configurations inherit (most) settings from the enclosing target scope.
+  # Find the keys that they inherit.  Since configuration setup is done before
+  # conditional, exclude, and rules processing, be careful with handling of
+  # the suffix characters used in those phases.
+  configuration_keys = []
+  for key in target_dict:
+    key_ext = key[-1:]
+    if key_ext in key_suffixes:
+      key_base = key[:-1]
+    else:
+      key_base = key
+    if not key_base in non_configuration_keys:
+      configuration_keys.append(key)
+
+  # Skip abstract configurations (saves work only).
+  concrete_configurations = [
+      configuration for configuration in target_dict['configurations'].keys()
+      if not target_dict['configurations'][configuration].get('abstract')]
+
+  for configuration in concrete_configurations:
+    # Get the inheritance relationship right by copying the inherited
+    # settings.  They're removed from the target dict once all of its
+    # configurations have been built, so the last configuration can take them
+    # over instead of copying them.
+    if configuration == concrete_configurations[-1]:
+      new_configuration_dict = dict([(key, target_dict[key])
+                                     for key in configuration_keys])
+    else:
+      new_configuration_dict = dict(
+          [(key, gyp.simple_copy.deepcopy(target_dict[key]))
+           for key in configuration_keys])
 
     # Merge in configuration (with all its parents first).
     MergeConfigWithInheritance(new_configuration_dict, build_file,
@@ -1878,16 +2962,7 @@ def SetUpConfigurations(target, target_dict):
   # Now that all of the target's configurations have been built, go through
   # the target dict's keys and remove everything that's been moved into a
   # "configurations" section.
-  delete_keys = []
-  for key in target_dict:
-    key_ext = key[-1:]
-    if key_ext in key_suffixes:
-      key_base = key[:-1]
-    else:
-      key_base = key
-    if not key_base in non_configuration_keys:
-      delete_keys.append(key)
-  for key in delete_keys:
+  for key in configuration_keys:
     del target_dict[key]
 
   # Check the configurations to see if they contain invalid keys.
@@ -1900,6 +2975,72 @@ def SetUpConfigurations(target, target_dict):
 
 
 
+# Maps tuples of (action, pattern) regex filters to the functions that apply
+# them, see CompileListFilter.  Targets in a tree mostly share the same
+# platform filters, so their patterns are only compiled once.  The cache is
+# emptied when it holds list_filter_cache_size filters.
+cached_list_filters = {}
+list_filter_cache_size = 1024
+
+# Patterns that can't be wrapped in a group and joined with others without
+# changing their meaning: numbered and named backreferences refer to groups
+# that move, and inline flags apply to the whole expression.
+_UNCOMBINABLE_PATTERN_RE = re.compile(r'\\[1-9]|\(\?P=|\(\?[iLmsux]')
+
+
+def CompileListFilter(filters):
+  """Returns a function that takes a list item and returns True if the last
+  of the regex filters that matches it is an 'include', False if it is an
+  'exclude', or None if no filter matches it.
+
+  All of the patterns are joined into one alternation, so that the items that
+  no filter matches, which are most of them, only need one search.  The
+  patterns are only tried one at a time, from the last one back, for items
+  that matched the alternation.
+  """
+  filters = tuple([(action, pattern) for action, pattern in filters])
+  try:
+    return cached_list_filters[filters]
+  except KeyError:
+    pass
+
+  compiled = [(action == 'include', re.compile(pattern))
+              for action, pattern in reversed(filters)]
+  combined = None
+  if len(compiled) > 1 and \
+     not any(_UNCOMBINABLE_PATTERN_RE.search(pattern)
+             for action, pattern in filters):
+    try:
+      combined = re.compile('|'.join(['(?:%s)' % pattern
+                                      for action, pattern in filters]))
+    except (re.error, AssertionError):
+      # Named groups may be repeated across patterns, and Python 2 raises an
+      # AssertionError for a regex with more than 100 groups.
+      pass
+
+  if combined is not None and \
+     len(set([action for action, pattern in filters])) == 1:
+    # Every filter has the same action, so it doesn't matter which matched.
+    include = compiled[0][0]
+    def ListFilter(item):
+      if combined.search(item):
+        return include
+      return None
+  else:
+    def ListFilter(item):
+      if combined is not None and not combined.search(item):
+        return None
+      for include, pattern_re in compiled:
+        if pattern_re.search(item):
+          return include
+      return None
+
+  if len(cached_list_filters) >= list_filter_cache_size:
+    cached_list_filters.clear()
+  cached_list_filters[filters] = ListFilter
+  return ListFilter
+
+
 def ProcessListFiltersInDict(name, the_dict):
   """Process regular expression and exclusion-based filters on lists.
 
@@ -1966,55 +3107,28 @@ def ProcessListFiltersInDict(name, the_dict):
   for list_key in lists:
     the_list = the_dict[list_key]
 
-    # Initialize the list_actions list, which is parallel to the_list.  Each
-    # item in list_actions identifies whether the corresponding item in
-    # the_list should be excluded, unconditionally preserved (included), or
-    # whether no exclusion or inclusion has been applied.  Items for which
-    # no exclusion or inclusion has been applied (yet) have value -1, items
-    # excluded have value 0, and items included have value 1.  Includes and
-    # excludes override previous actions.  All items in list_actions are
-    # initialized to -1 because no excludes or includes have been processed
-    # yet.
-    list_actions = list((-1,) * len(the_list))
-
+    # Each item in the_list is excluded, unconditionally preserved (included),
+    # or has had no exclusion or inclusion applied.  Items in the exclusion
+    # list start out excluded, and the last regex filter that matches an item
+    # overrides that.
     exclude_key = list_key + '!'
-    if exclude_key in the_dict:
-      for exclude_item in the_dict[exclude_key]:
-        for index in xrange(0, len(the_list)):
-          if exclude_item == the_list[index]:
-            # This item matches the exclude_item, so set its action to 0
-            # (exclude).
-            list_actions[index] = 0
-
-      # The "whatever!" list is no longer needed, dump it.
-      del the_dict[exclude_key]
+    exclude_items = the_dict.pop(exclude_key, [])
+    try:
+      exclude_lookup = set(exclude_items)
+    except TypeError:
+      # Exclusions may be unhashable, such as dicts in an "actions!" list.
+      exclude_lookup = exclude_items
 
     regex_key = list_key + '/'
+    list_filter = None
     if regex_key in the_dict:
       for regex_item in the_dict[regex_key]:
         [action, pattern] = regex_item
-        pattern_re = re.compile(pattern)
-
-        if action == 'exclude':
-          # This item matches an exclude regex, so set its value to 0 (exclude).
-          action_value = 0
-        elif action == 'include':
-          # This item matches an include regex, so set its value to 1 (include).
-          action_value = 1
-        else:
+        if action != 'exclude' and action != 'include':
           # This is an action that doesn't make any sense.
           raise ValueError, 'Unrecognized action ' + action + ' in ' + name + \
-                            ' key ' + key
-
-        for index in xrange(0, len(the_list)):
-          list_item = the_list[index]
-          if list_actions[index] == action_value:
-            # Even if the regex matches, nothing will change so continue (regex
-            # searches are expensive).
-            continue
-          if pattern_re.search(list_item):
-            # Regular expression match.
-            list_actions[index] = action_value
+                            ' key ' + regex_key
+      list_filter = CompileListFilter(the_dict[regex_key])
 
       # The "whatever/" list is no longer needed, dump it.
       del the_dict[regex_key]
@@ -2031,22 +3145,26 @@ def ProcessListFiltersInDict(name, the_dict):
           name + ' key ' + excluded_key + ' must not be present prior ' + \
           ' to applying exclusion/regex filters for ' + list_key
 
+    kept_list = []
     excluded_list = []
-
-    # Go backwards through the list_actions list so that as items are deleted,
-    # the indices of items that haven't been seen yet don't shift.  That means
-    # that things need to be prepended to excluded_list to maintain them in the
-    # same order that they existed in the_list.
-    for index in xrange(len(list_actions) - 1, -1, -1):
-      if list_actions[index] == 0:
-        # Dump anything with action 0 (exclude).  Keep anything with action 1
-        # (include) or -1 (no include or exclude seen for the item).
-        excluded_list.insert(0, the_list[index])
-        del the_list[index]
+    for list_item in the_list:
+      included = None
+      if list_filter is not None:
+        included = list_filter(list_item)
+      if included is None:
+        try:
+          included = list_item not in exclude_lookup
+        except TypeError:
+          included = list_item not in exclude_items
+      if included:
+        kept_list.append(list_item)
+      else:
+        excluded_list.append(list_item)
 
     # If anything was excluded, put the excluded list into the_dict at
     # excluded_key.
     if len(excluded_list) > 0:
+      the_list[:] = kept_list
       the_dict[excluded_key] = excluded_list
 
   # Now recurse into subdicts and lists that may contain dicts.
@@ -2141,6 +3259,45 @@ def ValidateRulesInTarget(target, target_dict, extra_sources_for_rules):
       rule['rule_sources'] = rule_sources
 
 
+def ValidateJumboInTarget(target, target_dict):
+  """Ensures that the jumbo settings in target_dict are valid.
+
+  A target with 'jumbo' set is compiled by merging its sources into
+  'jumbo_file_count' unity files per language, apart from those listed in
+  'jumbo_excluded_files'.
+
+  Arguments:
+    target: string, name of target.
+    target_dict: dict, target spec.
+
+  Raises an exception on error.
+  """
+  jumbo = target_dict.get('jumbo', 0)
+  if jumbo not in (0, 1):
+    raise Exception("Target %s has an invalid jumbo value '%s'.  "
+                    "Must be 0 or 1." % (target, jumbo))
+  if not jumbo:
+    return
+
+  if target_dict['type'] == 'none':
+    raise Exception("Target %s of type none can't be a jumbo target." %
+                    target)
+
+  file_count = target_dict.get('jumbo_file_count', 1)
+  if not isinstance(file_count, int) or file_count < 1:
+    raise Exception("Target %s has an invalid jumbo_file_count '%s'.  "
+                    "Must be a positive integer." % (target, file_count))
+
+  # List filters run before validation, so a file that a platform filter
+  # removed from sources is still a valid exclusion.
+  sources = set(target_dict.get('sources', []) +
+                target_dict.get('sources_excluded', []))
+  for excluded in target_dict.get('jumbo_excluded_files', []):
+    if excluded not in sources:
+      raise Exception("Target %s excludes %s from its jumbo build, but it "
+                      "isn't one of its sources." % (target, excluded))
+
+
 def ValidateActionsInTarget(target, target_dict, build_file):
   '''Validates the inputs to the actions in a target.'''
   target_name = target_dict.get('target_name')
@@ -2244,7 +3401,8 @@ def VerifyNoCollidingTargets(targets):
 
 
 def Load(build_files, variables, includes, depth, generator_input_info, check,
-         circular_check):
+         circular_check, parallel_jobs=0, cache_dir=None, low_memory=False,
+         command_cache=None, command_prefetch_jobs=0, pymod_prefetch_jobs=0):
   # Set up path_sections and non_configuration_keys with the default data plus
   # the generator-specifc data.
   global path_sections
@@ -2267,6 +3425,22 @@ def Load(build_files, variables, includes, depth, generator_input_info, check,
   multiple_toolsets = generator_input_info[
       'generator_supports_multiple_toolsets']
 
+  global load_cache_dir
+  load_cache_dir = cache_dir
+  if load_cache_dir and not os.path.isdir(load_cache_dir):
+    os.makedirs(load_cache_dir)
+
+  global command_cache_dir
+  command_cache_dir = command_cache
+  if command_cache_dir and not os.path.isdir(command_cache_dir):
+    os.makedirs(command_cache_dir)
+
+  global command_jobs
+  command_jobs = command_prefetch_jobs
+
+  global pymod_jobs
+  pymod_jobs = pymod_prefetch_jobs
+
   # A generator can have other lists (in addition to sources) be processed
   # for rules.
   extra_sources_for_rules = generator_input_info['extra_sources_for_rules']
@@ -2280,98 +3454,139 @@ def Load(build_files, variables, includes, depth, generator_input_info, check,
   # track of the keys corresponding to "target" files.
   data = {'target_build_files': set()}
   aux_data = {}
-  for build_file in build_files:
-    # Normalize paths everywhere.  This is important because paths will be
-    # used as keys to the data dict and for references between input files.
-    build_file = os.path.normpath(build_file)
-    try:
-      LoadTargetBuildFile(build_file, data, aux_data, variables, includes,
-                          depth, check)
-    except Exception, e:
-      gyp.common.ExceptionAppend(e, 'while trying to load %s' % build_file)
-      raise
+  # Normalize paths everywhere.  This is important because paths will be
+  # used as keys to the data dict and for references between input files.
+  build_files = [os.path.normpath(build_file) for build_file in build_files]
+  with gyp.profiling.Span('load'):
+    if parallel_jobs > 1:
+      LoadTargetBuildFilesParallel(build_files, data, aux_data, variables,
+                                   includes, depth, check, parallel_jobs)
+    else:
+      try:
+        for build_file in build_files:
+          try:
+            LoadTargetBuildFile(build_file, data, aux_data, variables,
+                                includes, depth, check)
+          except Exception, e:
+            gyp.common.ExceptionAppend(e,
+                                       'while trying to load %s' % build_file)
+            raise
+        ClosePymodPool()
+      finally:
+        # Only does anything if loading failed.
+        TerminatePymodPool()
+
+    if low_memory:
+      DropIncludedBuildFiles(data)
+
+    peak_memory_use = PeakMemoryUse()
+    if peak_memory_use is not None:
+      gyp.DebugOutput(gyp.DEBUG_MEMORY,
+                      'Peak memory use after loading: %d MB' %
+                      (peak_memory_use / 1024))
+
+  with gyp.profiling.Span('qualify'):
+    # Build a dict to access each target's subdict by qualified name.
+    targets = BuildTargetsDict(data)
+
+    # Fully qualify all dependency links.
+    QualifyDependencies(targets)
+
+    # Expand dependencies specified as build_file:*.
+    ExpandWildcardDependencies(targets, data)
+
+    # Apply exclude (!) and regex (/) list filters only for
+    # dependency_sections.
+    for target_name, target_dict in targets.iteritems():
+      tmp_dict = {}
+      for key_base in dependency_sections:
+        for op in ('', '!', '/'):
+          key = key_base + op
+          if key in target_dict:
+            tmp_dict[key] = target_dict[key]
+            del target_dict[key]
+      ProcessListFiltersInDict(target_name, tmp_dict)
+      # Write the results back to |target_dict|.
+      for key in tmp_dict:
+        target_dict[key] = tmp_dict[key]
+
+  with gyp.profiling.Span('dependencies'):
+    if circular_check:
+      # Make sure that any targets in a.gyp don't contain dependencies in other
+      # .gyp files that further depend on a.gyp.
+      VerifyNoGYPFileCircularDependencies(targets)
+
+    [dependency_nodes, flat_list] = BuildDependencyList(targets)
+
+    # Check that no two targets in the same directory have the same name.
+    VerifyNoCollidingTargets(flat_list)
+
+  with gyp.profiling.Span('dependent settings'):
+    # Handle dependent settings of various types.
+    closures = DependencyClosures(flat_list, targets, dependency_nodes)
+    for settings_type in ['all_dependent_settings',
+                          'direct_dependent_settings',
+                          'link_settings']:
+      DoDependentSettings(settings_type, flat_list, targets, dependency_nodes,
+                          closures)
+
+      # Take out the dependent settings now that they've been published to all
+      # of the targets that require them.
+      for target in flat_list:
+        if settings_type in targets[target]:
+          del targets[target][settings_type]
+
+    # Make sure static libraries don't declare dependencies on other static
+    # libraries, but that linkables depend on all unlinked static libraries
+    # that they need so that their link steps will be correct.
+    gii = generator_input_info
+    if gii['generator_wants_static_library_dependencies_adjusted']:
+      sort_dependencies = gii['generator_wants_sorted_dependencies']
+      AdjustStaticLibraryDependencies(flat_list, targets, dependency_nodes,
+                                      closures, sort_dependencies)
 
-  # Build a dict to access each target's subdict by qualified name.
-  targets = BuildTargetsDict(data)
-
-  # Fully qualify all dependency links.
-  QualifyDependencies(targets)
-
-  # Expand dependencies specified as build_file:*.
-  ExpandWildcardDependencies(targets, data)
-
-  # Apply exclude (!) and regex (/) list filters only for dependency_sections.
-  for target_name, target_dict in targets.iteritems():
-    tmp_dict = {}
-    for key_base in dependency_sections:
-      for op in ('', '!', '/'):
-        key = key_base + op
-        if key in target_dict:
-          tmp_dict[key] = target_dict[key]
-          del target_dict[key]
-    ProcessListFiltersInDict(target_name, tmp_dict)
-    # Write the results back to |target_dict|.
-    for key in tmp_dict:
-      target_dict[key] = tmp_dict[key]
-
-  if circular_check:
-    # Make sure that any targets in a.gyp don't contain dependencies in other
-    # .gyp files that further depend on a.gyp.
-    VerifyNoGYPFileCircularDependencies(targets)
-
-  [dependency_nodes, flat_list] = BuildDependencyList(targets)
-
-  # Check that no two targets in the same directory have the same name.
-  VerifyNoCollidingTargets(flat_list)
-
-  # Handle dependent settings of various types.
-  for settings_type in ['all_dependent_settings',
-                        'direct_dependent_settings',
-                        'link_settings']:
-    DoDependentSettings(settings_type, flat_list, targets, dependency_nodes)
-
-    # Take out the dependent settings now that they've been published to all
-    # of the targets that require them.
+  # Apply "post"/"late"/"target" variable expansions and condition evaluations.
+  with gyp.profiling.Span('late expansion'):
     for target in flat_list:
-      if settings_type in targets[target]:
-        del targets[target][settings_type]
-
-  # Make sure static libraries don't declare dependencies on other static
-  # libraries, but that linkables depend on all unlinked static libraries
-  # that they need so that their link steps will be correct.
-  gii = generator_input_info
-  if gii['generator_wants_static_library_dependencies_adjusted']:
-    AdjustStaticLibraryDependencies(flat_list, targets, dependency_nodes,
-                                    gii['generator_wants_sorted_dependencies'])
+      target_dict = targets[target]
+      build_file = gyp.common.BuildFile(target)
+      with gyp.profiling.Span(target, gyp.profiling.TARGET, 'late expansion'):
+        ProcessVariablesAndConditionsInDict(target_dict, True, variables,
+                                            build_file)
 
-  # Apply "post"/"late"/"target" variable expansions and condition evaluations.
-  for target in flat_list:
-    target_dict = targets[target]
-    build_file = gyp.common.BuildFile(target)
-    ProcessVariablesAndConditionsInDict(target_dict, True, variables,
-                                        build_file)
+  gyp.DebugOutput(gyp.DEBUG_VARIABLES,
+                  'Conditions: %d cache hits, %d compiled, %d without eval' %
+                  (condition_cache_hits, condition_cache_misses,
+                   fast_conditions))
 
   # Move everything that can go into a "configurations" section into one.
-  for target in flat_list:
-    target_dict = targets[target]
-    SetUpConfigurations(target, target_dict)
+  with gyp.profiling.Span('configurations'):
+    for target in flat_list:
+      target_dict = targets[target]
+      with gyp.profiling.Span(target, gyp.profiling.TARGET, 'configurations'):
+        SetUpConfigurations(target, target_dict)
 
   # Apply exclude (!) and regex (/) list filters.
-  for target in flat_list:
-    target_dict = targets[target]
-    ProcessListFiltersInDict(target, target_dict)
+  with gyp.profiling.Span('filters'):
+    for target in flat_list:
+      target_dict = targets[target]
+      with gyp.profiling.Span(target, gyp.profiling.TARGET, 'filters'):
+        ProcessListFiltersInDict(target, target_dict)
 
   # Make sure that the rules make sense, and build up rule_sources lists as
   # needed.  Not all generators will need to use the rule_sources lists, but
   # some may, and it seems best to build the list in a common spot.
-  # Also validate actions and run_as elements in targets.
-  for target in flat_list:
-    target_dict = targets[target]
-    build_file = gyp.common.BuildFile(target)
-    ValidateTargetType(target, target_dict)
-    ValidateRulesInTarget(target, target_dict, extra_sources_for_rules)
-    ValidateRunAsInTarget(target, target_dict, build_file)
-    ValidateActionsInTarget(target, target_dict, build_file)
+  # Also validate jumbo settings, actions and run_as elements in targets.
+  with gyp.profiling.Span('validation'):
+    for target in flat_list:
+      target_dict = targets[target]
+      build_file = gyp.common.BuildFile(target)
+      with gyp.profiling.Span(target, gyp.profiling.TARGET, 'validation'):
+        ValidateTargetType(target, target_dict)
+        ValidateRulesInTarget(target, target_dict, extra_sources_for_rules)
+        ValidateJumboInTarget(target, target_dict)
+        ValidateRunAsInTarget(target, target_dict, build_file)
+        ValidateActionsInTarget(target, target_dict, build_file)
 
   # Generators might not expect ints.  Turn them into strs.
   TurnIntIntoStrInDict(data)
@@ -0,0 +1,469 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Unit tests for the input.py file."""
+
+import gyp.input
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+
+class TestFlattenToList(unittest.TestCase):
+
+  def _BuildGraph(self, dependencies):
+    """Returns the root node of a graph built the way BuildDependencyList
+    does, from a list of (target, [dependencies]) pairs."""
+    nodes = {}
+    for target, _ in dependencies:
+      nodes[target] = gyp.input.DependencyGraphNode(target)
+    root = gyp.input.DependencyGraphNode(None)
+    for target, target_dependencies in dependencies:
+      node = nodes[target]
+      if not target_dependencies:
+        node.dependencies = [root]
+        root.dependents.append(node)
+      for dependency in target_dependencies:
+        node.dependencies.append(nodes[dependency])
+        nodes[dependency].dependents.append(node)
+    return root
+
+  def test_Chain(self):
+    root = self._BuildGraph([('c', ['b']), ('b', ['a']), ('a', [])])
+    self.assertEqual(['a', 'b', 'c'], root.FlattenToList())
+
+  def test_Diamond(self):
+    root = self._BuildGraph([('top', ['left', 'right']),
+                             ('left', ['bottom']),
+                             ('right', ['bottom']),
+                             ('bottom', [])])
+    self.assertEqual(['bottom', 'left', 'right', 'top'], root.FlattenToList())
+
+  def test_ReadyOrder(self):
+    # Nodes are flattened in the order in which they become ready, so x, which
+    # only waits for a, comes before b's dependent y.
+    root = self._BuildGraph([('a', []), ('b', []),
+                             ('y', ['b']), ('x', ['a']),
+                             ('z', ['x', 'y'])])
+    self.assertEqual(['a', 'b', 'x', 'y', 'z'], root.FlattenToList())
+
+  def test_Cycle(self):
+    root = self._BuildGraph([('a', []), ('b', ['a', 'c']), ('c', ['b'])])
+    self.assertEqual(['a'], root.FlattenToList())
+
+
+class TestDependencyClosures(unittest.TestCase):
+
+  def setUp(self):
+    # exe links lib1, which uses the static libraries lib2 and lib3, and the
+    # shared library so, which has its own static library so_lib.  tool is an
+    # executable that lib3 depends on, for example to run it in an action.
+    self.targets = {}
+    for target, target_type, dependencies in [
+        ('exe', 'executable', ['lib1', 'so']),
+        ('lib1', 'static_library', ['lib2', 'lib3']),
+        ('lib2', 'static_library', ['lib3']),
+        ('lib3', 'static_library', ['tool']),
+        ('tool', 'executable', []),
+        ('so', 'shared_library', ['so_lib']),
+        ('so_lib', 'static_library', []),
+    ]:
+      self.targets[target] = {'target_name': target, 'type': target_type}
+      if dependencies:
+        self.targets[target]['dependencies'] = dependencies
+    (self.dependency_nodes, self.flat_list) = \
+        gyp.input.BuildDependencyList(self.targets)
+    self.closures = gyp.input.DependencyClosures(
+        self.flat_list, self.targets, self.dependency_nodes)
+
+  def test_DeepDependencies(self):
+    self.assertEqual(['lib1', 'lib2', 'lib3', 'tool', 'so', 'so_lib'],
+                     self.closures.DeepDependencies('exe'))
+    self.assertEqual([], self.closures.DeepDependencies('tool'))
+    for target in self.flat_list:
+      self.assertEqual(self.dependency_nodes[target].DeepDependencies(),
+                       self.closures.DeepDependencies(target))
+
+  def test_LinkDependencies(self):
+    self.assertEqual(['exe', 'lib1', 'lib2', 'lib3', 'so'],
+                     self.closures.LinkDependencies('exe'))
+    self.assertEqual(['so', 'so_lib'], self.closures.LinkDependencies('so'))
+    self.assertEqual([], self.closures.LinkDependencies('lib1'))
+    for target in self.flat_list:
+      self.assertEqual(
+          self.dependency_nodes[target].LinkDependencies(self.targets),
+          self.closures.LinkDependencies(target))
+
+  def test_LinkDependenciesNoTraverse(self):
+    self.targets['lib1']['type'] = 'none'
+    self.targets['lib1']['dependencies_traverse'] = 0
+    self.assertEqual(['exe', 'lib1', 'so'],
+                     self.closures.LinkDependencies('exe'))
+
+
+class TestValidateJumboInTarget(unittest.TestCase):
+
+  def Validate(self, **settings):
+    target_dict = {'target_name': 'a', 'type': 'static_library',
+                   'sources': ['a.cc', 'b.cc']}
+    target_dict.update(settings)
+    gyp.input.ValidateJumboInTarget('a.gyp:a#target', target_dict)
+
+  def test_Valid(self):
+    self.Validate()
+    self.Validate(jumbo=1, jumbo_file_count=2, jumbo_excluded_files=['b.cc'])
+    # Sources that a list filter removed can still be excluded.
+    self.Validate(jumbo=1, sources_excluded=['c_win.cc'],
+                  jumbo_excluded_files=['b.cc', 'c_win.cc'])
+    # The other settings don't matter unless jumbo is set.
+    self.Validate(jumbo=0, jumbo_file_count=0, type='none')
+
+  def test_Invalid(self):
+    self.assertRaises(Exception, self.Validate, jumbo=2)
+    self.assertRaises(Exception, self.Validate, jumbo=1, type='none')
+    self.assertRaises(Exception, self.Validate, jumbo=1, jumbo_file_count=0)
+    self.assertRaises(Exception, self.Validate, jumbo=1,
+                      jumbo_file_count='2')
+    self.assertRaises(Exception, self.Validate, jumbo=1,
+                      jumbo_excluded_files=['c.cc'])
+
+
+class TestExpandVariables(unittest.TestCase):
+
+  def setUp(self):
+    self.variables = {
+      'name': 'value',
+      'number': 5,
+      'list': ['a', 'b c'],
+      'indirect': '<(name)',
+    }
+
+  def Expand(self, input, is_late=False):
+    return gyp.input.ExpandVariables(input, is_late, self.variables, 'f.gyp')
+
+  def test_Literal(self):
+    self.assertEqual('plain', self.Expand('plain'))
+    self.assertEqual(12, self.Expand('12'))
+    self.assertEqual('a < b', self.Expand('a < b'))
+
+  def test_References(self):
+    self.assertEqual('x-value-5', self.Expand('x-<(name)-<(number)'))
+    self.assertEqual(5, self.Expand('<(number)'))
+    self.assertEqual('<(name)', self.Expand('<(name)', is_late=True))
+    self.assertEqual('value', self.Expand('>(name)', is_late=True))
+    self.assertEqual('value', self.Expand('<(indirect)'))
+
+  def test_Lists(self):
+    self.assertEqual(['a', 'b c'], self.Expand('<@(list)'))
+    self.assertEqual(['value'], self.Expand('<@(name)'))
+    self.assertEqual('a "b c"', self.Expand('<(list)'))
+
+  def test_Undefined(self):
+    self.assertRaises(KeyError, self.Expand, '<(undefined)')
+
+
+class TestCommands(unittest.TestCase):
+
+  def setUp(self):
+    gyp.input.cached_command_results.clear()
+
+  def Expand(self, input, build_file='f.gyp'):
+    return gyp.input.ExpandVariables(input, False, {'n': 'x'}, build_file)
+
+  def test_Cache(self):
+    self.assertEqual('a', self.Expand('<!(echo a)'))
+    self.assertEqual('a', gyp.input.GetCachedCommandResult(
+        gyp.input.CommandCacheKey(None, 'echo a', None)))
+    # The directory the command runs in is part of the key.
+    self.assertEqual(None, gyp.input.GetCachedCommandResult(
+        gyp.input.CommandCacheKey(None, 'echo a', 'sub')))
+    self.assertEqual(['a', 'b'], self.Expand('<!@nocache(echo a b)'))
+    self.assertEqual(1, len(gyp.input.cached_command_results))
+
+  def test_CacheKeyDirectory(self):
+    key = gyp.input.CommandCacheKey(None, 'pwd', 'sub')
+    self.assertEqual(key, gyp.input.CommandCacheKey(
+        None, 'pwd', os.path.join(os.getcwd(), 'sub')))
+    # The same relative directory in another tree is a different directory.
+    oldwd = os.getcwd()
+    os.chdir(tempfile.gettempdir())
+    try:
+      self.assertNotEqual(key, gyp.input.CommandCacheKey(None, 'pwd', 'sub'))
+    finally:
+      os.chdir(oldwd)
+
+  def test_CacheKeyEnvironment(self):
+    def Key():
+      return gyp.input.CommandCacheKey(None, 'echo $GYPTEST_A', None)
+    saved = os.environ.copy()
+    try:
+      os.environ.pop('GYPTEST_A', None)
+      key = Key()
+      # Unrelated variables are not part of the key.
+      os.environ['GYPTEST_B'] = '1'
+      self.assertEqual(key, Key())
+      # Variables that the command names and GYP_* variables are.
+      os.environ['GYPTEST_A'] = '1'
+      self.assertNotEqual(key, Key())
+      key = Key()
+      os.environ['GYP_DEFINES'] = 'gyptest=1'
+      self.assertNotEqual(key, Key())
+    finally:
+      os.environ.clear()
+      os.environ.update(saved)
+
+  def test_FindPrefetchableCommands(self):
+    commands = []
+    gyp.input.FindPrefetchableCommands({
+      'variables': {'v': '<!(echo v) <!pymod_do_main(m)'},
+      'sources': ['<!@(["ls", "-a"])', '<!(echo <(n))', '<!nocache(date)'],
+      'conditions': [['OS=="mac"', {'defines': ['<!(echo mac)']}]],
+    }, commands)
+    self.assertEqual([(None, ['ls', '-a'], False), (None, 'echo v', True),
+                      ('pymod_do_main', 'm', True)],
+                     sorted(commands))
+
+  def test_PymodDoMain(self):
+    module_dir = tempfile.mkdtemp()
+    try:
+      f = open(os.path.join(module_dir, 'gyp_input_test_pymod.py'), 'w')
+      f.write('import os\n'
+              'def DoMain(argv):\n'
+              '  if argv == ["fail"]:\n'
+              '    raise ValueError(argv)\n'
+              '  return " ".join(argv + [os.path.basename(os.getcwd())])\n')
+      f.close()
+      sys.path.insert(0, module_dir)
+      cwd = os.getcwd()
+      self.assertEqual('a b %s' % os.path.basename(module_dir),
+                       gyp.input.RunPymodDoMain('gyp_input_test_pymod a b',
+                                                module_dir))
+      self.assertRaises(ValueError, gyp.input.RunPymodDoMain,
+                        'gyp_input_test_pymod fail', module_dir)
+      self.assertEqual(cwd, os.getcwd())
+    finally:
+      sys.path.remove(module_dir)
+      shutil.rmtree(module_dir)
+
+
+class TestCompileCondition(unittest.TestCase):
+
+  def Evaluate(self, cond_expr, variables):
+    return bool(gyp.input.CompileCondition(cond_expr)(variables))
+
+  def test_Fast(self):
+    variables = {'OS': 'linux', 'component': 'shared_library', 'x': 0}
+    self.assertTrue(self.Evaluate('OS=="linux"', variables))
+    self.assertTrue(self.Evaluate('OS!="mac" and not x', variables))
+    self.assertTrue(self.Evaluate('x==1 or component=="shared_library"',
+                                  variables))
+    self.assertRaises(NameError, self.Evaluate, 'undefined==1', variables)
+    # and/or stop at the first operand that decides the result, as eval does.
+    self.assertFalse(self.Evaluate('x and undefined', variables))
+
+  def test_Eval(self):
+    variables = {'OS': 'linux', 'x': 2}
+    self.assertTrue(self.Evaluate('OS in ("linux", "mac")', variables))
+    self.assertTrue(self.Evaluate('1 < x < 3', variables))
+    self.assertRaises(SyntaxError, self.Evaluate, 'OS==', variables)
+
+  def test_Constants(self):
+    variables = {'x': 0}
+    self.assertFalse(self.Evaluate('x==None', variables))
+    self.assertTrue(self.Evaluate('not None', variables))
+    self.assertTrue(self.Evaluate('x!=None and not x', variables))
+    # True and False are left to eval, so they behave as they always have.
+    for cond_expr in ('True', 'False', 'x==False', 'not True'):
+      try:
+        expected = bool(eval(cond_expr, {'__builtins__': None}, variables))
+      except NameError:
+        self.assertRaises(NameError, self.Evaluate, cond_expr, variables)
+      else:
+        self.assertEqual(expected, self.Evaluate(cond_expr, variables))
+
+  def test_Cached(self):
+    evaluator = gyp.input.CompileCondition('OS=="win"')
+    self.assertTrue(evaluator is gyp.input.CompileCondition('OS=="win"'))
+
+
+class TestListFilters(unittest.TestCase):
+
+  def test_Regex(self):
+    the_dict = {
+      'sources': ['a.cc', 'a_linux.cc', 'a_mac.cc', 'a_win.cc', 'b_mac.mm'],
+      'sources/': [['exclude', '_(linux|mac|win)\\.cc$'],
+                   ['include', '_mac\\.cc$'],
+                   ['exclude', '^a_mac'],
+                   ['exclude', '\\.mm$']],
+    }
+    gyp.input.ProcessListFiltersInDict('target', the_dict)
+    self.assertEqual({'sources': ['a.cc'],
+                      'sources_excluded': ['a_linux.cc', 'a_mac.cc',
+                                           'a_win.cc', 'b_mac.mm']},
+                     the_dict)
+
+  def test_ManyGroups(self):
+    # The combined regex would have more groups than Python 2 supports.
+    the_dict = {
+      'sources': ['p1_a.cc', 'x/p60/b.cc', 'p61.cc'],
+      'sources/': [['exclude', '(^|/)p%d(_|/)' % n] for n in xrange(61)],
+    }
+    gyp.input.ProcessListFiltersInDict('target', the_dict)
+    self.assertEqual({'sources': ['p61.cc'],
+                      'sources_excluded': ['p1_a.cc', 'x/p60/b.cc']},
+                     the_dict)
+
+  def test_ExclusionsAndIncludes(self):
+    the_dict = {
+      'sources': ['a.cc', 'b.cc', 'c.cc', 'b.cc'],
+      'sources!': ['b.cc', 'c.cc'],
+      'sources/': [['include', '^c']],
+    }
+    gyp.input.ProcessListFiltersInDict('target', the_dict)
+    self.assertEqual({'sources': ['a.cc', 'c.cc'],
+                      'sources_excluded': ['b.cc', 'b.cc']},
+                     the_dict)
+
+  def test_UnhashableExclusions(self):
+    the_dict = {
+      'actions': [{'action_name': 'a'}, {'action_name': 'b'}],
+      'actions!': [{'action_name': 'a'}],
+    }
+    gyp.input.ProcessListFiltersInDict('target', the_dict)
+    self.assertEqual({'actions': [{'action_name': 'b'}],
+                      'actions_excluded': [{'action_name': 'a'}]},
+                     the_dict)
+
+  def test_UnrecognizedAction(self):
+    the_dict = {'sources': ['a.cc'], 'sources/': [['remove', 'a']]}
+    self.assertRaises(ValueError, gyp.input.ProcessListFiltersInDict,
+                      'target', the_dict)
+
+  def test_Backreference(self):
+    list_filter = gyp.input.CompileListFilter([['exclude', '(a)\\1'],
+                                               ['include', '(b)\\1']])
+    self.assertEqual(False, list_filter('xaa'))
+    self.assertEqual(True, list_filter('aabb'))
+    self.assertEqual(None, list_filter('ab'))
+
+  def test_Cached(self):
+    list_filter = gyp.input.CompileListFilter([['exclude', 'a'],
+                                               ['include', 'b']])
+    self.assertTrue(list_filter is
+                    gyp.input.CompileListFilter((('exclude', 'a'),
+                                                 ('include', 'b'))))
+
+
+class TestCheckedEval(unittest.TestCase):
+
+  def test_Values(self):
+    contents = """
+# A comment.
+{
+  'variables': {'a': 'b' 'c', 'n': -1},
+  'targets': [{'target_name': 'x', 'sources': ['x.c']}],
+}
+"""
+    self.assertEqual(eval(contents), gyp.input.CheckedEval(contents))
+
+  def test_RepeatedKey(self):
+    try:
+      gyp.input.CheckedEval("{\n  'a': [{'b': 1,\n         'b': 2}],\n}")
+      self.fail('Repeated key was accepted')
+    except KeyError, e:
+      self.assertEqual("Key 'b' repeated at level 3 with key path 'a.0' "
+                       "(line 3, column 10)", e.args[0])
+
+  def test_UnknownNode(self):
+    self.assertRaises(TypeError, gyp.input.CheckedEval, "{'a': [1, x]}")
+    self.assertRaises(TypeError, gyp.input.CheckedEval, "{'a': 1 + 2}")
+    self.assertRaises(SyntaxError, gyp.input.CheckedEval, "{'a': }")
+
+
+class TestMergeLists(unittest.TestCase):
+
+  def Merge(self, to, fro, append=True):
+    gyp.input.MergeLists(to, fro, 'a.gyp', 'a.gyp', append=append)
+    return to
+
+  def test_Append(self):
+    self.assertEqual(['a', 'b', '-x', 'c', '-x'],
+                     self.Merge(['a', 'b', '-x'], ['b', 'c', '-x', 'c']))
+
+  def test_Prepend(self):
+    self.assertEqual(['c', 'a', '-x', 'b', '-x', {}],
+                     self.Merge(['a', 'b', '-x', {}, 'c'], ['c', 'a', '-x'],
+                                append=False))
+
+  def test_PrependRepeated(self):
+    # Prepending a singleton a second time leaves the insertion point where it
+    # was, so the next item of |to| ends up before it.
+    self.assertEqual(['x', 'a', 'b', 'y'],
+                     self.Merge(['x', 'y'], ['a', 'a', 'b'], append=False))
+
+
+class TestSetUpConfigurations(unittest.TestCase):
+
+  def setUp(self):
+    # Load normally sets this up, with the generator's keys added.
+    self.non_configuration_keys = gyp.input.non_configuration_keys
+    gyp.input.non_configuration_keys = gyp.input.base_non_configuration_keys
+
+  def tearDown(self):
+    gyp.input.non_configuration_keys = self.non_configuration_keys
+
+  def test_Configurations(self):
+    target_dict = {
+      'target_name': 'a',
+      'type': 'none',
+      'sources': ['a.c'],
+      'defines': ['A'],
+      'configurations': {
+        'Common': {'abstract': 1, 'defines': ['COMMON']},
+        'Debug': {'inherit_from': ['Common'], 'defines': ['DEBUG']},
+        'Release': {'inherit_from': ['Common']},
+      },
+    }
+    gyp.input.SetUpConfigurations('a.gyp:a#target', target_dict)
+    configurations = target_dict['configurations']
+    self.assertEqual(['Debug', 'Release'], sorted(configurations))
+    self.assertEqual(['A', 'COMMON', 'DEBUG'],
+                     configurations['Debug']['defines'])
+    self.assertEqual(['A', 'COMMON'], configurations['Release']['defines'])
+    self.assertFalse('sources' in configurations['Debug'])
+    self.assertFalse('defines' in target_dict)
+    self.assertEqual(['a.c'], target_dict['sources'])
+    self.assertEqual('Debug', target_dict['default_configuration'])
+
+
+class TestVariableScope(unittest.TestCase):
+
+  def test_Overlay(self):
+    parent = {'a': 1, 'b': 2}
+    scope = gyp.input.VariableScope(parent)
+    scope['b'] = 3
+    scope['c'] = 4
+    child = gyp.input.VariableScope(scope)
+    child['a'] = 5
+    self.assertEqual({'a': 1, 'b': 2}, parent)
+    self.assertEqual({'a': 1, 'b': 3, 'c': 4}, scope.copy())
+    self.assertEqual({'a': 5, 'b': 3, 'c': 4}, child.copy())
+    self.assertEqual(3, child['b'])
+    self.assertTrue('c' in child)
+    self.assertFalse('d' in child)
+    self.assertRaises(KeyError, child.__getitem__, 'd')
+
+  def test_Eval(self):
+    scope = gyp.input.VariableScope({'OS': 'linux'})
+    scope['_type'] = 'none'
+    self.assertTrue(eval('OS=="linux" and _type=="none"',
+                         {'__builtins__': None}, scope))
+
+
+if __name__ == '__main__':
+  unittest.main()
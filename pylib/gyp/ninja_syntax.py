@@ -34,8 +34,12 @@ class Writer(object):
             value = ' '.join(filter(None, value))  # Filter out empty strings.
         self._line('%s = %s' % (key, value), indent)
 
+    def pool(self, name, depth):
+        self._line('pool %s' % name)
+        self.variable('depth', depth, indent=1)
+
     def rule(self, name, command, description=None, depfile=None,
-             generator=False, restat=False, deplist=None):
+             generator=False, pool=None, restat=False, deplist=None):
         self._line('rule %s' % name)
         self.variable('command', command, indent=1)
         if description:
@@ -46,6 +50,8 @@ class Writer(object):
             self.variable('deplist', deplist, indent=1)
         if generator:
             self.variable('generator', '1', indent=1)
+        if pool:
+            self.variable('pool', pool, indent=1)
         if restat:
             self.variable('restat', '1', indent=1)
 
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Unit tests for the ninja_syntax.py file."""
+
+import gyp.ninja_syntax as ninja_syntax
+import StringIO
+import unittest
+
+
+class TestWriter(unittest.TestCase):
+
+  def Write(self, text, indent=0, **kwargs):
+    output = StringIO.StringIO()
+    writer = ninja_syntax.Writer(output, **kwargs)
+    writer._line(text, indent)
+    return output.getvalue()
+
+  def test_Wrap(self):
+    self.assertEqual('aaaa bbbb $\n'
+                     '    cccc $\n'
+                     '    dddd eeee\n',
+                     self.Write('aaaa bbbb cccc dddd eeee', width=12))
+    self.assertEqual('  aaaa $\n'
+                     '      bbbb\n',
+                     self.Write('aaaa bbbb', indent=1, width=8))
+
+  def test_EscapedSpaces(self):
+    # Escaped spaces are never broken at, and a word longer than the width
+    # goes on a line of its own.
+    self.assertEqual('aa$ bb$ cc $\n'
+                     '    dd\n',
+                     self.Write('aa$ bb$ cc dd', width=10))
+    self.assertEqual('aaaaaaaaaaaa $\n'
+                     '    b\n',
+                     self.Write('aaaaaaaaaaaa b', width=8))
+    self.assertEqual('a$$ b\n', self.Write('a$$ b', width=78))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,221 @@
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+This module records where a gyp run spends its time and memory, for --profile.
+
+The phases of gyp.input.Load and the generator's GenerateOutput are recorded as
+spans, and so is the work done for each build file and each target.  Write
+saves them in the Chrome trace event format, which chrome://tracing can display,
+with a summary of the totals per phase, build file and target under the
+"gypProfile" key for scripts that compare runs.
+
+Recording is off until Start is called, and Span is cheap while it is off, so
+the instrumentation can stay in place.
+"""
+
+import gc
+import json
+import os
+import time
+
+try:
+  # Not available on Windows.
+  import resource
+except ImportError:
+  resource = None
+
+
+# The Profile being recorded, or None if profiling is off.
+profile = None
+
+# Categories of spans.
+PHASE = 'phase'
+BUILD_FILE = 'build_file'
+TARGET = 'target'
+
+
+def _Usage():
+  """Returns the CPU time used by this process so far, in seconds, and its
+  peak resident set size in KB, or None if that isn't known."""
+  if resource:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return (usage.ru_utime + usage.ru_stime, usage.ru_maxrss)
+  times = os.times()
+  return (times[0] + times[1], None)
+
+
+def _ResidentSize():
+  """Returns the current resident set size of this process in KB, or None if
+  it can't be read."""
+  try:
+    f = open('/proc/self/statm')
+  except IOError:
+    return None
+  try:
+    pages = int(f.read().split()[1])
+  finally:
+    f.close()
+  return pages * os.sysconf('SC_PAGE_SIZE') / 1024
+
+
+class Profile(object):
+  """The spans recorded during a gyp run."""
+
+  def __init__(self):
+    self.start = time.time()
+    self.events = []
+    # Maps each category to a dict of name -> {phase: totals}.
+    self.totals = {PHASE: {}, BUILD_FILE: {}, TARGET: {}}
+
+  def Add(self, name, category, phase, start, wall, cpu, args):
+    """Records a span that started at the time start and took wall seconds,
+    of which cpu seconds were spent in this process."""
+    args = dict(args)
+    args['cpu_ms'] = round(cpu * 1000, 3)
+    event = {
+      'name': name,
+      'cat': category,
+      'ph': 'X',
+      'ts': int((start - self.start) * 1000000),
+      'dur': int(wall * 1000000),
+      'pid': os.getpid(),
+      'tid': 0,
+      'args': args,
+    }
+    if category != PHASE:
+      event['args']['phase'] = phase
+    self.events.append(event)
+
+    key = phase or name
+    entry = self.totals[category].setdefault(name, {})
+    total = entry.setdefault(key, {'wall_ms': 0, 'cpu_ms': 0, 'count': 0})
+    total['wall_ms'] += wall * 1000
+    total['cpu_ms'] += cpu * 1000
+    total['count'] += 1
+    for arg in ('rss_kb', 'max_rss_kb', 'objects'):
+      if arg in args:
+        total[arg] = args[arg]
+
+  def Counter(self, name, values):
+    """Records counter values, which chrome://tracing plots over time."""
+    self.events.append({
+      'name': name,
+      'ph': 'C',
+      'ts': int((time.time() - self.start) * 1000000),
+      'pid': os.getpid(),
+      'tid': 0,
+      'args': values,
+    })
+
+  def Write(self, path):
+    def Round(totals):
+      for entry in totals.itervalues():
+        for total in entry.itervalues():
+          total['wall_ms'] = round(total['wall_ms'], 3)
+          total['cpu_ms'] = round(total['cpu_ms'], 3)
+      return totals
+
+    report = {
+      'traceEvents': self.events,
+      'displayTimeUnit': 'ms',
+      'gypProfile': {
+        'wall_ms': round((time.time() - self.start) * 1000, 3),
+        'phases': Round(self.totals[PHASE]),
+        'build_files': Round(self.totals[BUILD_FILE]),
+        'targets': Round(self.totals[TARGET]),
+      },
+    }
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+      os.makedirs(directory)
+    f = open(path, 'w')
+    try:
+      json.dump(report, f, indent=1, sort_keys=True)
+      f.write('\n')
+    finally:
+      f.close()
+
+
+class _Span(object):
+  """Records the time taken by the body of a with statement."""
+
+  def __init__(self, name, category, phase, args):
+    self.name = name
+    self.category = category
+    self.phase = phase
+    self.args = args
+
+  def __enter__(self):
+    if self.category == PHASE:
+      # Counting the objects that the garbage collector tracks walks all of
+      # them, so it is only done around whole phases.  It is the closest
+      # measure of allocations that Python 2 offers.
+      self.objects = len(gc.get_objects())
+      self.rss = _ResidentSize()
+    (self.cpu, max_rss) = _Usage()
+    self.start = time.time()
+    return self
+
+  def __exit__(self, exc_type, exc_value, tb):
+    wall = time.time() - self.start
+    (cpu, max_rss) = _Usage()
+    args = self.args
+    if self.category == PHASE:
+      args = dict(args)
+      args['objects'] = len(gc.get_objects()) - self.objects
+      rss = _ResidentSize()
+      if rss is not None:
+        args['rss_kb'] = rss - self.rss
+      if max_rss is not None:
+        args['max_rss_kb'] = max_rss
+    profile.Add(self.name, self.category, self.phase, self.start, wall,
+                cpu - self.cpu, args)
+    if self.category == PHASE:
+      memory = {}
+      if rss is not None:
+        memory['rss_kb'] = rss
+      if max_rss is not None:
+        memory['max_rss_kb'] = max_rss
+      if memory:
+        profile.Counter('memory', memory)
+    return False
+
+
+class _NoSpan(object):
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, tb):
+    return False
+
+
+_no_span = _NoSpan()
+
+
+def Span(name, category=PHASE, phase=None, **args):
+  """Returns a context manager that records the time taken by its body as a
+  span called name, if profiling is on.
+
+  category is PHASE for a phase of the whole run, which also records memory
+  use, or BUILD_FILE or TARGET for the work done for one build file or target
+  during the phase named by phase.  args are shown with the span.
+  """
+  if profile is None:
+    return _no_span
+  return _Span(name, category, phase, args)
+
+
+def Start():
+  """Turns profiling on."""
+  global profile
+  profile = Profile()
+
+
+def Stop(path):
+  """Turns profiling off, and writes what was recorded to path."""
+  global profile
+  if profile is not None:
+    profile.Write(path)
+    profile = None
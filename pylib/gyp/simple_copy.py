@@ -0,0 +1,49 @@
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""A version of copy.deepcopy that only handles the types found in gyp data:
+dicts, lists and immutable scalars.  gyp copies such large structures that the
+memo and type dispatch of copy.deepcopy take a noticeable share of its time.
+The structures being copied must not contain cycles."""
+
+
+class Error(Exception):
+  pass
+
+
+def deepcopy(x):
+  """Returns a deep copy of x, which may be made of dicts, lists, strings,
+  numbers, booleans and None."""
+  try:
+    return _deepcopy_dispatch[type(x)](x)
+  except KeyError:
+    raise Error('Unsupported type %s for deepcopy' % type(x).__name__)
+
+
+def _deepcopy_atomic(x):
+  return x
+
+
+def _deepcopy_list(x):
+  return [deepcopy(a) for a in x]
+
+
+def _deepcopy_dict(x):
+  y = {}
+  for key, value in x.iteritems():
+    y[key] = deepcopy(value)
+  return y
+
+
+_deepcopy_dispatch = {
+  type(None): _deepcopy_atomic,
+  bool: _deepcopy_atomic,
+  int: _deepcopy_atomic,
+  long: _deepcopy_atomic,
+  float: _deepcopy_atomic,
+  str: _deepcopy_atomic,
+  unicode: _deepcopy_atomic,
+  list: _deepcopy_list,
+  dict: _deepcopy_dict,
+}
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+Verifies that --command-cache-dir reuses the output of <!() commands across
+runs unless the environment changes, that <!nocache() commands run every time,
+and that independent commands are prefetched when --command-jobs is given.
+"""
+
+import os
+
+import TestGyp
+
+test = TestGyp.TestGyp()
+
+def run_gyp():
+  test.run_gyp('commands.gyp', '--command-cache-dir=gyp-command-cache',
+               '--command-jobs=2', '-d', 'variables', chdir='src')
+
+def check_runs(name, expected):
+  runs = test.read(['src', name + '.log']).count('ran\n')
+  if runs != expected:
+    print '%s ran %d times, expected %d' % (name, runs, expected)
+    test.fail_test()
+
+run_gyp()
+test.must_contain_all_lines(test.stdout(), [
+    "Prefetched command 'python count.py greeting Hello'",
+    "Prefetched command 'python count.py name world'",
+])
+
+run_gyp()
+check_runs('greeting', 1)
+check_runs('name', 1)
+check_runs('runs', 2)
+
+os.environ['GYP_TEST_COMMAND_CACHE'] = '1'
+run_gyp()
+check_runs('greeting', 2)
+check_runs('runs', 3)
+
+# Commands are only prefetched when --command-jobs is given.
+test.run_gyp('commands.gyp', '--command-cache-dir=gyp-command-cache',
+             '-d', 'variables', chdir='src')
+test.must_not_contain_any_line(test.stdout(), ['Prefetched command'])
+
+test.build('commands.gyp', test.ALL, chdir='src')
+test.run_built_executable('program', chdir='src', stdout='Hello, world! 1\n')
+
+test.pass_test()
@@ -0,0 +1,24 @@
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+{
+  'variables': {
+    'greeting': '<!(python count.py greeting Hello)',
+    'name': '<!(python count.py name world)',
+    'runs': '<!nocache(python count.py runs 1)',
+  },
+  'targets': [
+    {
+      'target_name': 'program',
+      'type': 'executable',
+      'defines': [
+        'GREETING="<(greeting), <(name)!"',
+        'RUNS=<(runs)',
+      ],
+      'sources': [
+        'program.c',
+      ],
+    },
+  ],
+}
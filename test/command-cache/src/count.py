@@ -0,0 +1,13 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Prints its second argument, and appends a line to the log file named by its
+first argument so that the test can tell how often it ran."""
+
+import sys
+
+open(sys.argv[1] + '.log', 'a').write('ran\n')
+print sys.argv[2]
@@ -11,8 +11,8 @@ Verifies that Makefiles get rebuilt when a source gyp file changes.
 import TestGyp
 
 # Regenerating build files when a gyp file changes is currently only supported
-# by the make generator.
-test = TestGyp.TestGyp(formats=['make'])
+# by the make and ninja generators.
+test = TestGyp.TestGyp(formats=['make', 'ninja'])
 
 test.run_gyp('hello.gyp')
 
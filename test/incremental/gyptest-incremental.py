@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+Verifies that -G incremental only rewrites the targets affected by a change,
+including dependents that pick up the change through dependent settings.
+"""
+
+import TestGyp
+
+# Only the make and ninja generators support incremental regeneration.
+test = TestGyp.TestGyp(formats=['make', 'ninja'])
+
+test.run_gyp('incremental.gyp', '-G', 'incremental=1', '-d', 'general',
+             chdir='src')
+test.must_contain_all_lines(test.stdout(), ['0 of 3 targets up to date'])
+test.build('incremental.gyp', test.ALL, chdir='src')
+test.run_built_executable('program', chdir='src', stdout='Hello, world!\n')
+
+test.run_gyp('incremental.gyp', '-G', 'incremental=1', '-d', 'general',
+             chdir='src')
+test.must_contain_all_lines(test.stdout(), ['3 of 3 targets up to date'])
+
+# Changing the lib target's direct_dependent_settings only changes the output
+# for program, which picks them up.
+test.write('src/lib.gyp', test.read('src/lib-changed.gyp'))
+
+test.run_gyp('incremental.gyp', '-G', 'incremental=1', '-d', 'general',
+             chdir='src')
+test.must_contain_all_lines(test.stdout(), ['2 of 3 targets up to date'])
+test.build('incremental.gyp', test.ALL, chdir='src')
+test.run_built_executable('program', chdir='src', stdout='Hello, changed!\n')
+
+test.pass_test()
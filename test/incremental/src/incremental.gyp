@@ -0,0 +1,25 @@
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+{
+  'targets': [
+    {
+      'target_name': 'program',
+      'type': 'executable',
+      'dependencies': [
+        'lib.gyp:lib',
+      ],
+      'sources': [
+        'program.c',
+      ],
+    },
+    {
+      'target_name': 'unrelated',
+      'type': 'executable',
+      'sources': [
+        'unrelated.c',
+      ],
+    },
+  ],
+}
@@ -0,0 +1,20 @@
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+{
+  'targets': [
+    {
+      'target_name': 'lib',
+      'type': 'static_library',
+      'direct_dependent_settings': {
+        'defines': [
+          'MESSAGE="Hello, changed!"',
+        ],
+      },
+      'sources': [
+        'lib.c',
+      ],
+    },
+  ],
+}
@@ -0,0 +1,13 @@
+/* Copyright (c) 2012 Google Inc. All rights reserved.
+ * Use of this source code is governed by a BSD-style license that can be
+ * found in the LICENSE file. */
+
+#include <stdio.h>
+
+extern void lib_function(const char *message);
+
+int main(int argc, char *argv[])
+{
+  lib_function(MESSAGE);
+  return 0;
+}
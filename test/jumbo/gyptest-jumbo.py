@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+Verifies that the sources of a jumbo target are compiled in unity files,
+apart from the excluded ones, and that the unity files don't make an
+unchanged build do any work.
+"""
+
+import TestGyp
+
+test = TestGyp.TestGyp(formats=['make', 'ninja'])
+
+test.run_gyp('jumbo.gyp', chdir='src')
+
+test.build('jumbo.gyp', test.ALL, chdir='src')
+
+expect = """\
+1 3 5 1 2
+second merged: 1
+fourth merged: 1
+C merged: 1
+"""
+test.run_built_executable('program', chdir='src', stdout=expect)
+
+test.up_to_date('jumbo.gyp', test.ALL, chdir='src')
+
+test.pass_test()
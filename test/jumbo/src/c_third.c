@@ -0,0 +1,11 @@
+// Copyright (c) 2012 Google Inc. All rights reserved.
+// Use of this source code is governed by a BSD-style license that can be
+// found in the LICENSE file.
+
+int CThirdMerged(void) {
+#ifdef JUMBO_C_UNIT
+  return 1;
+#else
+  return 0;
+#endif
+}
@@ -0,0 +1,10 @@
+// Copyright (c) 2012 Google Inc. All rights reserved.
+// Use of this source code is governed by a BSD-style license that can be
+// found in the LICENSE file.
+
+// The second source of each unity file sees the macros of the first.
+#define JUMBO_FIRST_UNIT
+
+static int Number() { return 1; }
+
+int First() { return Number(); }
@@ -0,0 +1,37 @@
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+{
+  'targets': [
+    {
+      'target_name': 'lib',
+      'type': 'static_library',
+      'jumbo': 1,
+      'jumbo_file_count': 2,
+      'sources': [
+        'first.cc',
+        'second.cc',
+        'third.cc',
+        'fourth.cc',
+        'excluded.cc',
+        'c_first.c',
+        'c_second.c',
+        'c_third.c',
+      ],
+      'jumbo_excluded_files': [
+        'excluded.cc',
+      ],
+    },
+    {
+      'target_name': 'program',
+      'type': 'executable',
+      'dependencies': [
+        'lib',
+      ],
+      'sources': [
+        'program.cc',
+      ],
+    },
+  ],
+}
@@ -0,0 +1,23 @@
+// Copyright (c) 2012 Google Inc. All rights reserved.
+// Use of this source code is governed by a BSD-style license that can be
+// found in the LICENSE file.
+
+#include <stdio.h>
+
+extern "C" int CFirst(void);
+extern "C" int CSecond(void);
+extern "C" int CThirdMerged(void);
+int First();
+bool SecondMerged();
+int Third();
+bool FourthMerged();
+int Excluded();
+
+int main() {
+  printf("%d %d %d %d %d\n", First(), Third(), Excluded(), CFirst(),
+         CSecond());
+  printf("second merged: %d\n", SecondMerged());
+  printf("fourth merged: %d\n", FourthMerged());
+  printf("C merged: %d\n", CThirdMerged());
+  return 0;
+}
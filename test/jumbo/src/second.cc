@@ -0,0 +1,11 @@
+// Copyright (c) 2012 Google Inc. All rights reserved.
+// Use of this source code is governed by a BSD-style license that can be
+// found in the LICENSE file.
+
+bool SecondMerged() {
+#ifdef JUMBO_FIRST_UNIT
+  return true;
+#else
+  return false;
+#endif
+}
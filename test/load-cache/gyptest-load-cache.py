@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+Verifies that --load-cache-dir reuses the results of loading unchanged build
+files, and that changing an included file invalidates them.
+"""
+
+import TestGyp
+
+test = TestGyp.TestGyp()
+
+test.run_gyp('cache.gyp', '--load-cache-dir=gyp-load-cache', '-d', 'general',
+             chdir='src')
+test.must_contain_all_lines(test.stdout(), ["Load cache miss for 'cache.gyp'"])
+test.build('cache.gyp', test.ALL, chdir='src')
+test.run_built_executable('cache', chdir='src',
+                          stdout='Hello from common.gypi\n')
+
+test.run_gyp('cache.gyp', '--load-cache-dir=gyp-load-cache', '-d', 'general',
+             chdir='src')
+test.must_contain_all_lines(test.stdout(), ["Load cache hit for 'cache.gyp'"])
+
+test.write('src/common.gypi', test.read('src/common-changed.gypi'))
+
+test.run_gyp('cache.gyp', '--load-cache-dir=gyp-load-cache', '-d', 'general',
+             chdir='src')
+test.must_contain_all_lines(test.stdout(), ["Load cache miss for 'cache.gyp'"])
+test.build('cache.gyp', test.ALL, chdir='src')
+test.run_built_executable('cache', chdir='src',
+                          stdout='Hello from common-changed.gypi\n')
+
+test.pass_test()
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+Verifies that --low-memory frees the included files after loading, that the
+build files still get the settings of the files they include, and that
+--debug memory reports the peak memory use of loading.
+"""
+
+import TestGyp
+
+test = TestGyp.TestGyp()
+
+dropped = "Dropping included build file 'common.gypi'"
+
+test.run_gyp('program.gyp', '-d', 'includes', chdir='src')
+test.must_not_contain_any_line(test.stdout(), [dropped])
+
+test.run_gyp('program.gyp', '--low-memory', '-d', 'includes', '-d', 'memory',
+             chdir='src')
+test.must_contain_all_lines(test.stdout(), [
+    dropped,
+    'Peak memory use after loading:',
+])
+
+test.build('program.gyp', test.ALL, chdir='src')
+
+test.run_built_executable('program', chdir='src',
+                          stdout='Hello from program.c (included)\n')
+
+test.pass_test()
@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+Verifies that the .mk files written by a pool of processes with -G make_jobs
+build a program that links a library from another .gyp file.
+"""
+
+import TestGyp
+
+test = TestGyp.TestGyp(formats=['make'])
+
+test.run_gyp('all.gyp', '-G', 'make_jobs=2', chdir='noload')
+
+test.build('all.gyp', test.ALL, chdir='noload')
+test.run_built_executable('exe', chdir='noload',
+                          stdout='Hello from shared.c.\n')
+
+test.pass_test()
@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+Verifies that links, and actions that ask for it, run in the link pool, whose
+depth is set with -G ninja_link_pool_depth.
+"""
+
+import TestGyp
+
+test = TestGyp.TestGyp(formats=['ninja'])
+
+test.run_gyp('link-pool.gyp', '-G', 'ninja_link_pool_depth=2', chdir='src')
+
+build_ninja = test.built_file_path('build.ninja', chdir='src')
+test.must_contain(build_ninja, 'pool link_pool\n  depth = 2\n')
+test.must_not_contain(build_ninja, 'linker.lock')
+# The link, solink and solink_module rules, and the rule of the action.
+if test.read(build_ninja).count('  pool = link_pool\n') != 4:
+  test.fail_test()
+
+test.build('link-pool.gyp', test.ALL, chdir='src')
+test.run_built_executable('program', chdir='src',
+                          stdout='Hello from the link pool\n')
+
+test.pass_test()
@@ -0,0 +1,35 @@
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+{
+  'targets': [
+    {
+      'target_name': 'program',
+      'type': 'executable',
+      'sources': [
+        'program.c',
+      ],
+      'actions': [
+        {
+          'action_name': 'generate_header',
+          'inputs': [
+            'emit.py',
+          ],
+          'outputs': [
+            '<(SHARED_INTERMEDIATE_DIR)/generated.h',
+          ],
+          'action': [
+            'python',
+            'emit.py',
+            '<(SHARED_INTERMEDIATE_DIR)/generated.h',
+          ],
+          'ninja_link_pool': 1,
+        },
+      ],
+      'include_dirs': [
+        '<(SHARED_INTERMEDIATE_DIR)',
+      ],
+    },
+  ],
+}
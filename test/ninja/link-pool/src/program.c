@@ -0,0 +1,13 @@
+/* Copyright (c) 2012 Google Inc. All rights reserved.
+ * Use of this source code is governed by a BSD-style license that can be
+ * found in the LICENSE file. */
+
+#include <stdio.h>
+
+#include "generated.h"
+
+int main(int argc, char *argv[])
+{
+  printf("%s\n", MESSAGE);
+  return 0;
+}
@@ -0,0 +1,24 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+Verifies that the .ninja files written by a pool of processes with
+-G ninja_jobs build the same program, in every configuration.
+"""
+
+import TestGyp
+
+test = TestGyp.TestGyp(formats=['ninja'])
+
+test.run_gyp('parallel-writers.gyp', '-G', 'ninja_jobs=3', chdir='src')
+
+for config, expect in [('Debug', 'Debug\n'), ('Release', 'Release\n')]:
+  test.set_configuration(config)
+  test.build('parallel-writers.gyp', test.ALL, chdir='src')
+  test.run_built_executable('program', chdir='src',
+                            stdout='Hello from lib1.c, lib2.c, ' + expect)
+
+test.pass_test()
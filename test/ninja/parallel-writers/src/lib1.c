@@ -0,0 +1,8 @@
+/* Copyright (c) 2012 Google Inc. All rights reserved.
+ * Use of this source code is governed by a BSD-style license that can be
+ * found in the LICENSE file. */
+
+const char *lib1(void)
+{
+  return "lib1.c";
+}
@@ -0,0 +1,46 @@
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+{
+  'target_defaults': {
+    'default_configuration': 'Debug',
+    'configurations': {
+      'Debug': {
+        'defines': ['CONFIG="Debug"'],
+      },
+      'Release': {
+        'defines': ['CONFIG="Release"'],
+      },
+    },
+  },
+  'targets': [
+    {
+      'target_name': 'program',
+      'type': 'executable',
+      'dependencies': [
+        'lib1',
+      ],
+      'sources': [
+        'program.c',
+      ],
+    },
+    {
+      'target_name': 'lib1',
+      'type': 'static_library',
+      'dependencies': [
+        'lib2',
+      ],
+      'sources': [
+        'lib1.c',
+      ],
+    },
+    {
+      'target_name': 'lib2',
+      'type': 'static_library',
+      'sources': [
+        'lib2.c',
+      ],
+    },
+  ],
+}
@@ -0,0 +1,14 @@
+/* Copyright (c) 2012 Google Inc. All rights reserved.
+ * Use of this source code is governed by a BSD-style license that can be
+ * found in the LICENSE file. */
+
+#include <stdio.h>
+
+extern const char *lib1(void);
+extern const char *lib2(void);
+
+int main(int argc, char *argv[])
+{
+  printf("Hello from %s, %s, %s\n", lib1(), lib2(), CONFIG);
+  return 0;
+}
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+Verifies that ninja regenerates its build files when a gyp file changes, and
+that a build with nothing to regenerate is a no-op.
+"""
+
+import TestGyp
+
+test = TestGyp.TestGyp(formats=['ninja'])
+
+test.run_gyp('regen.gyp', chdir='src')
+
+test.build('regen.gyp', test.ALL, chdir='src')
+test.run_built_executable('program', chdir='src', stdout="Hello\n")
+
+test.up_to_date('regen.gyp', test.ALL, chdir='src')
+
+# Sleep so that the changed gyp file will have a newer timestamp than the
+# previously generated build files.
+test.sleep()
+test.write('src/regen.gyp',
+           test.read('src/regen.gyp').replace('Hello', 'Goodbye'))
+
+test.build('regen.gyp', test.ALL, chdir='src')
+test.run_built_executable('program', chdir='src', stdout="Goodbye\n")
+
+test.up_to_date('regen.gyp', test.ALL, chdir='src')
+
+test.pass_test()
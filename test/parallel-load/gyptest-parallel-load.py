@@ -0,0 +1,24 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+Verifies that build files that depend on each other and share includes can be
+loaded in parallel worker processes.
+"""
+
+import TestGyp
+
+test = TestGyp.TestGyp()
+
+test.run_gyp('main.gyp', '--parallel-load', '--parallel-load-jobs=2',
+             chdir='src')
+
+test.build('main.gyp', test.ALL, chdir='src')
+
+test.run_built_executable('main', chdir='src',
+                          stdout='Hello from lib.c (DEPTH .)\n')
+
+test.pass_test()
@@ -0,0 +1,21 @@
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+{
+  'includes': [
+    'common.gypi',
+  ],
+  'targets': [
+    {
+      'target_name': 'main',
+      'type': 'executable',
+      'dependencies': [
+        'lib/lib.gyp:lib',
+      ],
+      'sources': [
+        'main.c',
+      ],
+    },
+  ],
+}
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+Verifies that --profile writes a Chrome trace with the phases of the run and
+the time taken by each build file and target.
+"""
+
+import json
+import os
+
+import TestGyp
+
+test = TestGyp.TestGyp()
+
+test.run_gyp('profile.gyp', '--profile=profile/gyp.json', chdir='src')
+
+report = json.loads(test.read(['src', 'profile', 'gyp.json']))
+
+events = report['traceEvents']
+phases = set([event['name'] for event in events
+              if event.get('cat') == 'phase'])
+expected_phases = set(['load', 'qualify', 'dependencies', 'dependent settings',
+                       'late expansion', 'configurations', 'filters',
+                       'validation', 'generate'])
+if phases != expected_phases:
+  print 'Unexpected phases:', sorted(phases)
+  test.fail_test()
+
+for event in events:
+  if event['ph'] == 'X' and (event['dur'] < 0 or 'cpu_ms' not in event['args']):
+    print 'Bad span:', event
+    test.fail_test()
+
+summary = report['gypProfile']
+build_files = sorted(summary['build_files'])
+if build_files != [os.path.join('lib', 'lib.gyp'), 'profile.gyp']:
+  print 'Unexpected build files:', build_files
+  test.fail_test()
+
+targets = summary['targets']
+for target in (os.path.join('lib', 'lib.gyp') + ':lib#target',
+               'profile.gyp:program#target'):
+  if sorted(targets.get(target, {})) != ['configurations', 'filters',
+                                         'late expansion', 'validation']:
+    print 'Unexpected phases for %s: %s' % (target, targets.get(target))
+    test.fail_test()
+
+test.build('profile.gyp', test.ALL, chdir='src')
+test.run_built_executable('program', chdir='src', stdout='Hello from lib\n')
+
+test.pass_test()
@@ -0,0 +1,7 @@
+/* Copyright (c) 2012 Google Inc. All rights reserved.
+ * Use of this source code is governed by a BSD-style license that can be
+ * found in the LICENSE file. */
+
+const char* lib_message(void) {
+  return "Hello from lib";
+}
@@ -0,0 +1,12 @@
+/* Copyright (c) 2012 Google Inc. All rights reserved.
+ * Use of this source code is governed by a BSD-style license that can be
+ * found in the LICENSE file. */
+
+#include <stdio.h>
+
+extern const char* lib_message(void);
+
+int main(void) {
+  printf("%s\n", lib_message());
+  return 0;
+}
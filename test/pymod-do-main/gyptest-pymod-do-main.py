@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""
+Verifies that <!pymod_do_main() runs DoMain in gyp's own process, or with
+--pymod-jobs in worker processes, for a build file in the current directory,
+and that the worker processes are shut down when loading fails or DoMain
+exits.
+"""
+
+import os
+
+import TestGyp
+
+test = TestGyp.TestGyp()
+
+# Let gyp import helper.py from the build file's directory.
+os.environ['PYTHONPATH'] = os.pathsep.join(
+    ['.'] + os.environ.get('PYTHONPATH', '').split(os.pathsep))
+
+expect = """\
+Hello from first
+Hello from second
+"""
+
+test.run_gyp('pymod.gyp', chdir='src')
+test.build('pymod.gyp', test.ALL, chdir='src')
+test.run_built_executable('program', chdir='src', stdout=expect)
+
+test.run_gyp('pymod.gyp', '--pymod-jobs=2', '-d', 'variables', chdir='src')
+test.must_contain_all_lines(test.stdout(), [
+    "Prefetched pymod_do_main 'helper first'",
+    "Prefetched pymod_do_main 'helper second'",
+])
+test.build('pymod.gyp', test.ALL, chdir='src')
+test.run_built_executable('program', chdir='src', stdout=expect)
+
+# A build file that fails to load shuts the worker processes down too.
+test.run_gyp('broken.gyp', '--pymod-jobs=2', chdir='src', status=1,
+             stderr=None)
+test.must_contain_all_lines(test.stderr(), ['missing.gyp not found'])
+
+# A DoMain that exits in a worker process is run again in gyp's own process,
+# which exits with its status rather than waiting for the worker.
+test.run_gyp('exit.gyp', '--pymod-jobs=2', chdir='src', status=2,
+             stderr=None)
+
+test.pass_test()
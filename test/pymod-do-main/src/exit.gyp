@@ -0,0 +1,16 @@
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+{
+  'variables': {
+    'first': '<!pymod_do_main(helper first)',
+    'exit': '<!pymod_do_main(helper exit)',
+  },
+  'targets': [
+    {
+      'target_name': 'program',
+      'type': 'none',
+    },
+  ],
+}
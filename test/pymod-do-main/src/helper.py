@@ -0,0 +1,14 @@
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""A module for <!pymod_do_main()."""
+
+
+import sys
+
+
+def DoMain(argv):
+  if argv[0] == 'exit':
+    sys.exit(2)
+  return 'Hello from %s' % argv[0]
@@ -0,0 +1,429 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2012 Google Inc. All rights reserved.
+# Use of this source code is governed by a BSD-style license that can be
+# found in the LICENSE file.
+
+"""Measures how long gyp takes, and how much memory it uses, on a synthetic
+tree of build files.
+
+The tree is generated from parameters: the number of build files, the targets
+in each, how many other targets each one depends on, how deeply includes are
+nested, and how many conditions and variables each build file has.  gyp is run
+on it once per generator in a fresh process, and the time spent in
+gyp.input.Load and in the generator's GenerateOutput is reported along with the
+peak memory use of the process.
+
+The results can be saved with --output and compared against a saved run with
+--baseline, which makes the exit status nonzero if anything got slower or
+bigger by more than --threshold percent.
+"""
+
+import json
+import optparse
+import os
+import pprint
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+
+GYP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+ALL_FORMATS = ['make', 'ninja', 'msvs', 'xcode', 'gypd']
+
+# The platforms that sources are split between, see WriteBuildFile.
+PLATFORMS = ['linux', 'mac', 'win']
+
+# The file that marks a --tree directory as written by this script, so that a
+# later run may replace it.
+TREE_MARKER = '.gyp-benchmark-tree'
+
+# The measurements compared against a baseline.
+METRICS = [('load', 'Load (s)'), ('generate', 'Generate (s)'),
+           ('total', 'Total (s)'), ('peak_mb', 'Peak (MB)')]
+
+
+def WriteDict(path, contents):
+  """Writes contents to path as a gyp file."""
+  f = open(path, 'w')
+  try:
+    f.write(pprint.pformat(contents))
+    f.write('\n')
+  finally:
+    f.close()
+
+
+def TargetName(build_file, target):
+  return 'target_%d_%d' % (build_file, target)
+
+
+def BuildFileName(build_file):
+  return 'dir_%d/build_%d.gyp' % (build_file, build_file)
+
+
+def WriteIncludes(tree, options):
+  """Writes a chain of options.include_depth included files, each of which
+  includes the next one, and returns the path of the first relative to the
+  build files, or None if there are none."""
+  if not options.include_depth:
+    return None
+  include_dir = os.path.join(tree, 'build')
+  os.makedirs(include_dir)
+  for level in xrange(options.include_depth):
+    contents = {
+      'variables': {
+        'include_level_%d%%' % level: str(level),
+      },
+      'target_defaults': {
+        'defines': ['INCLUDE_LEVEL_%d=<(include_level_%d)' % (level, level)],
+      },
+    }
+    if level + 1 < options.include_depth:
+      contents['includes'] = ['include_%d.gypi' % (level + 1)]
+    WriteDict(os.path.join(include_dir, 'include_%d.gypi' % level), contents)
+  return '../build/include_0.gypi'
+
+
+def WriteBuildFile(tree, build_file, include, rand, options):
+  """Writes the build file numbered build_file, with options.targets targets.
+
+  Every target depends on up to options.fan_out targets chosen at random from
+  the ones before it, so the dependency graph has no cycles.  Its sources are
+  split between platforms with "sources/" filters, and it has
+  options.conditions conditions that test the build file's variables.
+  """
+  # The gypd generator doesn't set OS, which the conditions and filters test.
+  variables = {'OS%': PLATFORMS[0]}
+  for index in xrange(options.variables):
+    if index == 0:
+      value = 'value_%d' % build_file
+    else:
+      # Refer to the previous variable, so that expansion has work to do.
+      value = '<(var_%d)_%d' % (index - 1, index)
+    variables['var_%d' % index] = value
+
+  targets = []
+  for target in xrange(options.targets):
+    sources = []
+    for index in xrange(options.sources):
+      sources.append('source_%d_%d.cc' % (target, index))
+      sources.append('source_%d_%d_%s.cc' %
+                     (target, index, PLATFORMS[index % len(PLATFORMS)]))
+
+    dependencies = []
+    first = build_file * options.targets + target
+    for other in rand.sample(xrange(first), min(options.fan_out, first)):
+      other_file, other_target = divmod(other, options.targets)
+      if other_file == build_file:
+        dependencies.append(TargetName(other_file, other_target))
+      else:
+        dependencies.append('../%s:%s' % (BuildFileName(other_file),
+                                          TargetName(other_file,
+                                                     other_target)))
+
+    conditions = []
+    for index in xrange(options.conditions):
+      variable = 'var_%d' % (index % max(options.variables, 1))
+      if options.variables:
+        condition = 'OS=="%s" and %s!=""' % (
+            PLATFORMS[index % len(PLATFORMS)], variable)
+      else:
+        condition = 'OS=="%s"' % PLATFORMS[index % len(PLATFORMS)]
+      conditions.append([condition, {
+        'defines': ['CONDITION_%d' % index],
+      }, {
+        'cflags': ['-DNOT_CONDITION_%d' % index],
+      }])
+
+    target_dict = {
+      'target_name': TargetName(build_file, target),
+      'type': 'static_library',
+      'sources': sources,
+      'sources/': [['exclude', '_(%s)\\.cc$' % '|'.join(PLATFORMS)],
+                   ['include', '_<(OS)\\.cc$']],
+      'dependencies': dependencies,
+      'include_dirs': ['.'],
+      'direct_dependent_settings': {
+        'include_dirs': ['include_%d' % target],
+        'defines': ['USES_%s' % TargetName(build_file, target).upper()],
+      },
+      'conditions': conditions,
+    }
+    if options.variables:
+      target_dict['defines'] = ['VALUE="<(var_%d)"' % (options.variables - 1)]
+    targets.append(target_dict)
+
+  contents = {
+    'variables': variables,
+    'targets': targets,
+  }
+  if include:
+    contents['includes'] = [include]
+
+  path = os.path.join(tree, BuildFileName(build_file))
+  os.makedirs(os.path.dirname(path))
+  WriteDict(path, contents)
+
+
+def GenerateTree(tree, options):
+  """Writes a synthetic tree into the directory tree, and returns the paths of
+  its build files relative to tree."""
+  rand = random.Random(options.seed)
+  include = WriteIncludes(tree, options)
+  build_files = []
+  for build_file in xrange(options.build_files):
+    WriteBuildFile(tree, build_file, include, rand, options)
+    build_files.append(BuildFileName(build_file))
+  return build_files
+
+
+def MeasureOne(format, build_files):
+  """Runs gyp for format in the current directory and returns the time spent
+  loading and generating, and the peak memory use.  This runs in a process of
+  its own, so that each measurement starts from a cold gyp."""
+  sys.path.insert(0, os.path.join(GYP_DIR, 'pylib'))
+  import gyp
+  import gyp.input
+
+  timings = {'load': 0.0, 'generate': 0.0}
+
+  def Timed(key, function):
+    def Wrapper(*args, **kw):
+      start = time.time()
+      try:
+        return function(*args, **kw)
+      finally:
+        timings[key] += time.time() - start
+    return Wrapper
+
+  # gyp.Load calls gyp.input.Load, and main calls the generator module's
+  # GenerateOutput, so wrapping them here times exactly those steps.
+  gyp.input.Load = Timed('load', gyp.input.Load)
+  generator_name = 'gyp.generator.' + format
+  generator = __import__(generator_name, globals(), locals(), generator_name)
+  generator.GenerateOutput = Timed('generate', generator.GenerateOutput)
+
+  start = time.time()
+  gyp.main(build_files + ['--depth=.', '--format=' + format,
+                          '--ignore-environment'])
+  timings['total'] = time.time() - start
+
+  try:
+    import resource
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+      # Reported in bytes rather than KB.
+      peak_kb /= 1024
+    timings['peak_mb'] = peak_kb / 1024.0
+  except ImportError:
+    timings['peak_mb'] = None
+  return timings
+
+
+def Measure(tree, format, build_files):
+  """Runs gyp for format on tree in a new process, and returns what MeasureOne
+  measured, or raises an Exception if gyp failed."""
+  work_dir = tempfile.mkdtemp(prefix='gyp-benchmark-')
+  try:
+    # Copy the tree so that the runs don't see each other's outputs, such as
+    # the .gypd files that the gypd generator writes next to the build files.
+    run_tree = os.path.join(work_dir, 'tree')
+    shutil.copytree(tree, run_tree)
+    proc = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--measure-one', format] +
+        build_files,
+        cwd=run_tree, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    (stdout, stderr) = proc.communicate()
+    if proc.returncode:
+      raise Exception('gyp -f %s failed:\n%s' % (format, stderr))
+    return json.loads(stdout.splitlines()[-1])
+  finally:
+    shutil.rmtree(work_dir)
+
+
+def Median(values):
+  values = sorted(values)
+  middle = len(values) / 2
+  if len(values) % 2:
+    return values[middle]
+  return (values[middle - 1] + values[middle]) / 2.0
+
+
+def RunBenchmark(tree, build_files, options):
+  """Returns a dict of the results for each format, each the median of
+  options.repeat runs, or an 'error' for formats that failed."""
+  results = {}
+  for format in options.formats:
+    runs = []
+    try:
+      for run in xrange(options.repeat):
+        runs.append(Measure(tree, format, build_files))
+    except Exception, e:
+      results[format] = {'error': str(e)}
+      print >>sys.stderr, str(e)
+      continue
+    result = {'runs': len(runs)}
+    for metric, title in METRICS:
+      values = [run[metric] for run in runs if run[metric] is not None]
+      if values:
+        result[metric] = Median(values)
+      else:
+        result[metric] = None
+    results[format] = result
+  return results
+
+
+def Compare(results, baseline, threshold):
+  """Prints results beside baseline, and returns the list of measurements
+  that are more than threshold percent worse than in baseline."""
+  regressions = []
+  header = '%-8s' % 'Format'
+  for metric, title in METRICS:
+    header += ' %14s' % title
+    if baseline:
+      header += ' %8s' % 'Change'
+  print header
+
+  for format in sorted(results):
+    result = results[format]
+    if 'error' in result:
+      print '%-8s failed' % format
+      continue
+    line = '%-8s' % format
+    base = baseline.get(format, {})
+    for metric, title in METRICS:
+      value = result[metric]
+      if value is None:
+        line += ' %14s' % '-'
+      else:
+        line += ' %14.3f' % value
+      if not baseline:
+        continue
+      base_value = base.get(metric)
+      if value is None or not base_value:
+        line += ' %8s' % '-'
+        continue
+      change = (value - base_value) * 100.0 / base_value
+      line += ' %+7.1f%%' % change
+      if change > threshold:
+        regressions.append('%s %s: %.3f -> %.3f (%+.1f%%)' %
+                           (format, title, base_value, value, change))
+    print line
+  return regressions
+
+
+def main(argv):
+  if argv[:1] == ['--measure-one']:
+    print json.dumps(MeasureOne(argv[1], argv[2:]))
+    return 0
+
+  parser = optparse.OptionParser(usage='usage: %prog [options]')
+  parser.add_option('--build-files', type='int', default=50, metavar='N',
+                    help='number of build files [default: %default]')
+  parser.add_option('--targets', type='int', default=10, metavar='M',
+                    help='targets in each build file [default: %default]')
+  parser.add_option('--fan-out', type='int', default=4, metavar='N',
+                    help='dependencies of each target [default: %default]')
+  parser.add_option('--sources', type='int', default=20, metavar='N',
+                    help='sources, and as many platform specific sources, in '
+                    'each target [default: %default]')
+  parser.add_option('--include-depth', type='int', default=3, metavar='N',
+                    help='nesting depth of the included files '
+                    '[default: %default]')
+  parser.add_option('--conditions', type='int', default=5, metavar='N',
+                    help='conditions in each target [default: %default]')
+  parser.add_option('--variables', type='int', default=10, metavar='N',
+                    help='variables in each build file [default: %default]')
+  parser.add_option('--seed', type='int', default=0,
+                    help='seed for choosing dependencies [default: %default]')
+  parser.add_option('-f', '--format', dest='formats', action='append',
+                    help='generator to measure, may be repeated '
+                    '[default: %s]' % ', '.join(ALL_FORMATS))
+  parser.add_option('--repeat', type='int', default=3, metavar='N',
+                    help='runs of each generator, of which the median is '
+                    'reported [default: %default]')
+  parser.add_option('--tree', metavar='DIR',
+                    help='write the tree into DIR and keep it, rather than '
+                    'using a temporary directory; DIR must be empty or hold '
+                    'a tree from an earlier run')
+  parser.add_option('--output', metavar='FILE',
+                    help='save the parameters and results as JSON to FILE')
+  parser.add_option('--baseline', metavar='FILE',
+                    help='compare the results against those saved in FILE by '
+                    '--output')
+  parser.add_option('--threshold', type='float', default=10.0, metavar='PCT',
+                    help='percentage by which a measurement may be worse than '
+                    'the baseline before it counts as a regression '
+                    '[default: %default]')
+  (options, args) = parser.parse_args(argv)
+  if args:
+    parser.error('unexpected arguments: %s' % ' '.join(args))
+  if not options.formats:
+    options.formats = ALL_FORMATS
+
+  parameters = {}
+  for name in ('build_files', 'targets', 'fan_out', 'sources', 'include_depth',
+               'conditions', 'variables', 'seed'):
+    parameters[name] = getattr(options, name)
+
+  baseline = {}
+  if options.baseline:
+    f = open(options.baseline)
+    try:
+      saved = json.load(f)
+    finally:
+      f.close()
+    if saved['parameters'] != parameters:
+      print >>sys.stderr, 'Warning: the baseline was measured on a tree ' \
+          'generated with different parameters: %s' % saved['parameters']
+    baseline = saved['results']
+
+  if options.tree:
+    tree = options.tree
+    if os.path.exists(tree) and os.listdir(tree):
+      if not os.path.exists(os.path.join(tree, TREE_MARKER)):
+        parser.error('%s is not empty and was not written by --tree' % tree)
+      shutil.rmtree(tree)
+    if not os.path.isdir(tree):
+      os.makedirs(tree)
+    open(os.path.join(tree, TREE_MARKER), 'w').close()
+  else:
+    tree = tempfile.mkdtemp(prefix='gyp-benchmark-tree-')
+  try:
+    build_files = GenerateTree(tree, options)
+    print '%d build files, %d targets' % (options.build_files,
+                                          options.build_files * options.targets)
+    results = RunBenchmark(tree, build_files, options)
+  finally:
+    if not options.tree:
+      shutil.rmtree(tree)
+
+  regressions = Compare(results, baseline, options.threshold)
+
+  if options.output:
+    f = open(options.output, 'w')
+    try:
+      json.dump({'parameters': parameters, 'results': results}, f, indent=2,
+                sort_keys=True)
+      f.write('\n')
+    finally:
+      f.close()
+
+  if regressions:
+    print
+    print 'Regressions of more than %g%%:' % options.threshold
+    for regression in regressions:
+      print '  ' + regression
+    return 1
+  for result in results.itervalues():
+    if 'error' in result:
+      return 1
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main(sys.argv[1:]))